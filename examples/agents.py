@@ -5,7 +5,7 @@ import math
 class RandomAgent(grl.Agent):
 
     def act(self, h):
-        return grl.epsilon_sample(self.am.actions)
+        return grl.epsilon_sample(self.am.actions, rng=self.random)
 
     def learn(self, h, a, e):
         return
@@ -26,12 +26,12 @@ class GreedyQAgent(grl.Agent):
 
     def start(self, e=None, order=1):
         self.order = order
-        self.am.action = grl.epsilon_sample(self.am.action_space)
+        self.am.action = grl.epsilon_sample(self.am.action_space, rng=self.random)
         return self.am.action
 
     def act(self, h):
         s = self.hm.state(h)
-        self.am.action = grl.epsilon_sample(self.am.action_space, max(self.Q[s])[1], 0.1)
+        self.am.action = grl.epsilon_sample(self.am.action_space, max(self.Q[s])[1], 0.1, rng=self.random)
         return self.am.action
     
     def learn(self, h, a, e):
@@ -44,14 +44,57 @@ class GreedyQAgent(grl.Agent):
 
         if self.keep_history: self.hm.history.append(a).append(e)
 
+class VectorQAgent(grl.Agent):
+    # n copies of a Q-learning agent on the last percept, e.g. for a grl.VectorDomain (with a grl.VectorSimulator)
+    def setup(self):
+        self.epsilon = self.kwargs.get('exploration_factor', 0.1)
+        self.g = self.kwargs.get('discount_factor', 0.999)
+        self.alpha = self.kwargs.get('learning_rate', 0.1)
+        self.Q = None
+
+    def interact(self, domain):
+        super().interact(domain)
+        self.n = domain.n
+        self.Q = np.full((self.n, len(self.pm.percept_space), len(self.am.action_space)), 
+                         float(self.kwargs.get('value_function_init', 0.0)))
+        self.copies = np.arange(self.n)
+
+    def start(self, e=None, order=1):
+        self.order = order
+        return self.am.action_space[self.np_random.integers(len(self.am.action_space))]
+
+    # the first len(e) copies
+    def act_many(self, e):
+        copies = self.copies[:len(e)]
+        greedy = self.Q[copies, e].argmax(axis=-1)
+        explore = self.np_random.random(len(e)) < self.epsilon
+        return np.where(explore, self.np_random.integers(len(self.am.action_space), size=len(e)), greedy)
+
+    def learn_many(self, e, a, r, e_next):
+        copies = self.copies[:len(e)]
+        target = r + self.g * self.Q[copies, e_next].max(axis=-1)
+        self.Q[copies, e, a] += self.alpha * (target - self.Q[copies, e, a])
+
+    # the Agent interface runs the first copy on the history (e.g. with a grl.Simulator)
+    def act(self, h):
+        e = np.array([self.pm.percept_space.index(h[-1])])
+        return self.am.action_space[self.act_many(e)[0]]
+
+    def learn(self, h, a, e):
+        r = self.rm.r(h, extension=[a, e], index=grl.Index.NEXT)
+        self.learn_many(np.array([self.pm.percept_space.index(h[-1])]), np.array([self.am.action_space.index(a)]), 
+                        np.array([r]), np.array([self.pm.percept_space.index(e)]))
+
 class InternalStateAgent(grl.Agent):
     pass
 
 class FrequencyAgent(grl.Agent):
     def setup(self):
-        self.n = grl.Storage(3, default=0)
-        self.r = grl.Storage(3, default=0)
-        self.p = grl.Storage(3, default=0)
+        # e.g. grl.DenseStorage or grl.FlatStorage for the models with many states
+        storage = self.kwargs.get('model_storage', grl.Storage)
+        self.n = storage(3, default=0)
+        self.r = storage(3, default=0)
+        self.p = storage(3, default=0)
         self.g = self.kwargs.get('discount_factor', 0.999)
         self.xpl = self.kwargs.get('exploration_factor', 0.1)
         self.eps = self.kwargs.get('tolerance', 1e-6)
@@ -59,6 +102,11 @@ class FrequencyAgent(grl.Agent):
         self.v = grl.Storage(1, default=0)
         self.pi = grl.Storage(2, default=1)
         self.index = 0
+        # incremental planning with a bounded number of backups per step (default: full PITabular per step)
+        self.planner = None
+        if self.kwargs.get('planning_budget', None):
+            self.planner = grl.PrioritizedSweeping(self.p, self.r, self.v, self.pi, g=self.g, 
+                                                   budget=self.kwargs['planning_budget'])
 
     def interact(self, domain):
         super().interact(domain)
@@ -66,10 +114,13 @@ class FrequencyAgent(grl.Agent):
         self.pi.set_default(1/len(self.am.action_space))
 
     def act(self, h):
-        self.pi, self.v = grl.PITabular(self.p, self.r, self.v, self.pi, g=self.g, steps=1, vi_steps=1)
+        if self.planner:
+            self.planner.plan()
+        else:
+            self.pi, self.v = grl.PITabular(self.p, self.r, self.v, self.pi, g=self.g, steps=1, vi_steps=1)
         # Oracle Alert!
         s = self.hm.state(h, g=self.g, q_func=self.oracle)
-        return grl.epsilon_sample(self.am.action_space, self.pi[s].argmax(), self.xpl)
+        return grl.epsilon_sample(self.am.action_space, self.pi[s].argmax(), self.xpl, rng=self.random)
 
     def learn(self, h, a, e):
         # Oracle Alert!
@@ -84,10 +135,12 @@ class FrequencyAgent(grl.Agent):
         self.p[s][a][s_next] += 1/(n_sum+1)
         # register the new input
         self.n[s][a][s_next] += 1
+        if self.planner: 
+            self.planner.update(s, a)
 
     def start(self, e=None, order=1):
         self.order = order
-        self.am.action = grl.epsilon_sample(self.am.action_space)
+        self.am.action = grl.epsilon_sample(self.am.action_space, rng=self.random)
         return self.am.action
 
     def stats(self, *args, **kwargs):
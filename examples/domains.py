@@ -1,6 +1,5 @@
 import grl
 import numpy as np
-import random
 
 class SimpleMDP(grl.Domain):
     def react(self, h, a):
@@ -14,7 +13,7 @@ class SimpleMDP(grl.Domain):
     def setup(self):
         self.sm.state_space = ['s-left', 's-right']
         self.am.action_space = ['left', 'right']
-        self.sm.state = grl.epsilon_sample(self.sm.state_space)
+        self.sm.state = grl.epsilon_sample(self.sm.state_space, rng=self.random)
 
     def transition_func(self, s, a):
         s_next = s
@@ -36,7 +35,7 @@ class SimpleMDP(grl.Domain):
             return 0
 
     def reset(self):
-        self.sm.state = grl.epsilon_sample(self.sm.state_space)
+        self.sm.state = grl.epsilon_sample(self.sm.state_space, rng=self.random)
     
     def oracle(self, h, *args, **kwargs):
         g = kwargs.get('g', 0.999)
@@ -53,6 +52,19 @@ class SimpleMDP(grl.Domain):
     def on(self, event):
         grl.occurrence_ratio_processor(type(self).__name__, 's-left', event)
 
+    # n copies of the domain advancing in lockstep
+    @classmethod
+    def vectorized(cls, n, **kwargs):
+        domain = cls()
+        S, A = domain.sm.state_space, domain.am.action_space
+        P = np.zeros((len(A), len(S), len(S)))
+        R = np.zeros(P.shape)
+        for i, a in enumerate(A):
+            for j, s in enumerate(S):
+                P[i, j, S.index(domain.transition_func(s, a))] = 1.0
+                R[i, j] = (s == 's-left' and a == 'left') or (s == 's-right' and a == 'right')
+        return grl.VectorDomain(n=n, P=P, R=R, actions=A, states=S, percepts=S, **kwargs)
+
 class SlipperyHill(grl.Domain):
     def setup(self):
         self.sm.state_space = [0, 1]
@@ -73,7 +85,7 @@ class SlipperyHill(grl.Domain):
         bang_ratio = h.stats.get(type(self).__name__, dict()).get('#', self.pmin)
         self.sm.hm.record([self.sm.state])
         if a == self.optimal_actions[self.sm.state]:
-            e_next = grl.epsilon_sample(self.pm.percept_space, '#', 1 - bang_ratio)
+            e_next = grl.epsilon_sample(self.pm.percept_space, '#', 1 - bang_ratio, rng=self.random)
             if (e_next == '#' and self.sm.state == 0) or (e_next == '@' and self.sm.state == 1):
                 self.sm.state = (self.sm.state + 1) % len(self.sm.state_space)
         else:
@@ -142,7 +154,7 @@ class DynamicKeys(grl.Domain):
         happy_ratio = h.stats.get(type(self).__name__, dict()).get(':)', 0.0)
         self.sm.hm.record([self.sm.state])
         if a == self.optimal_actions[self.sm.state]:
-            e_next = grl.epsilon_sample(self.pm.percept_space, ':)', 1 - happy_ratio)
+            e_next = grl.epsilon_sample(self.pm.percept_space, ':)', 1 - happy_ratio, rng=self.random)
             if e_next == ':)':
                 self.sm.state = (self.sm.state + 1) % len(self.sm.state_space)
         else:
@@ -166,6 +178,34 @@ class DynamicKeys(grl.Domain):
         else:
             return 0
     
+    # n copies of the domain advancing in lockstep
+    # the dynamics depend on the statistics of the history: the copies use a fixed ratio of ':)' instead
+    @classmethod
+    def vectorized(cls, n, happy_ratio=0.5, **kwargs):
+        domain = cls()
+        S, A = domain.sm.state_space, domain.am.action_space
+        P = np.zeros((len(A), len(S), len(S)))
+        R = np.zeros(P.shape)
+        for i, a in enumerate(A):
+            for j, s in enumerate(S):
+                if a == domain.optimal_actions[s]:
+                    P[i, j, (j + 1) % len(S)] += happy_ratio
+                    P[i, j, j] += 1 - happy_ratio
+                    R[i, j] = 1
+                else:
+                    P[i, j, j] = 1.0
+        # ':)' iff the state advances
+        E = np.eye(len(S), dtype=int)
+        return grl.VectorDomain(n=n, P=P, R=R, E=E, E0=1, actions=A, states=S, percepts=domain.pm.percept_space, 
+                                initial=np.eye(len(S))[0], **kwargs)
+
+    def oracle_key(self, h, *args, **kwargs):
+        # the oracle also depends on the statistics of the history
+        key = super().oracle_key(h, *args, **kwargs)
+        if key is None:
+            return None
+        return key + (h.stats.get(type(self).__name__, dict()).get(':)', 0.0),)
+
     def oracle(self, h, *args, **kwargs):
         Q = grl.Storage(1, default=h.stats.get(type(self).__name__, dict()).get(':)', 0.0), leaf_keys=self.am.action_space)
         if self.sm.hm.h.t == h.t:
@@ -187,7 +227,7 @@ class BlindMaze(grl.Domain):
         self.maze_len = self.kwargs.get('maze_len', 4)
         self.sm.state_space = [(x,y) for x in range(self.maze_len) for y in range(self.maze_len)]
         self.am.action_space = ['u', 'd', 'l', 'r']
-        self.sm.state = random.sample(self.sm.state_space, 1)[0]
+        self.sm.state = self.random.sample(self.sm.state_space, 1)[0]
 
     def transition_func(self, s, a):
         if a == 'u':
@@ -215,5 +255,23 @@ class BlindMaze(grl.Domain):
     def reward_func(self, h):
         return h[-1][1]
 
+    # n copies of the domain advancing in lockstep
+    @classmethod
+    def vectorized(cls, n, maze_len=4, **kwargs):
+        domain = cls(maze_len=maze_len)
+        S, A = domain.sm.state_space, domain.am.action_space
+        P = np.zeros((len(A), len(S), len(S)))
+        for i, a in enumerate(A):
+            for j, s in enumerate(S):
+                P[i, j, S.index(domain.transition_func(s, a))] = 1.0
+        # reaching (0,0) is rewarded and restarts the maze (the start percepts are also (s, 0))
+        goal = S.index((0,0))
+        R = np.zeros(P.shape)
+        R[:, :, goal] = 1.0
+        percepts = [(s, 0) for s in S] + [((0,0), 1)]
+        E = np.broadcast_to(np.arange(len(S)), P.shape).copy()
+        E[:, :, goal] = len(S)
+        return grl.VectorDomain(n=n, P=P, R=R, E=E, actions=A, states=S, percepts=percepts, terminal=[goal], **kwargs)
+
     def reset(self):
-        self.sm.state = random.sample(self.sm.state_space, 1)[0]
+        self.sm.state = self.random.sample(self.sm.state_space, 1)[0]
@@ -2,4 +2,7 @@ from .foundations import *
 from .managers import *
 from .learning import *
 from .utilities import *
-from .algorithms import *
\ No newline at end of file
+from .algorithms import *
+from .traces import *
+from .simulators import *
+from .profiling import *
\ No newline at end of file
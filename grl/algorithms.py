@@ -1,5 +1,309 @@
 import grl
 import math
+import heapq
+import itertools
+import collections
+import numpy as np
+
+class TabularModel:
+
+    """
+    Dense (compiled) form of a tabular model T[s][a][s'] and r[s][a][s'] (nested Storage objects or dicts).
+    P[a, s, s'] -- transition probabilities
+    R[a, s, s'] -- rewards (default 0 where r is not specified)
+    available[a, s] -- availability of the action a at the state s, i.e. a in T[s]
+    Note: the states are the keys of T followed by the next states which are not keys of T.
+    The values of the latter states are not updated by the algorithms.
+    
+    """
+
+    def __init__(self, T, r):
+        self.states = list(T.keys())
+        self.actions = list()
+        state_index = {s:i for i, s in enumerate(self.states)}
+        action_index = dict()
+        entries = list()
+        for s in self.states:
+            for a in T[s]:
+                if a not in action_index:
+                    action_index[a] = len(self.actions)
+                    self.actions.append(a)
+                for s_next, p in T[s][a].items():
+                    if s_next not in state_index:
+                        state_index[s_next] = len(self.states)
+                        self.states.append(s_next)
+                    try:
+                        r_next = r[s][a][s_next]
+                    except KeyError:
+                        r_next = 0.0
+                    entries.append((action_index[a], state_index[s], state_index[s_next], p, r_next))
+        self.n = len(T.keys()) # number of the updatable states
+        self.state_index = state_index
+        self.action_index = action_index
+        shape = (len(self.actions), len(self.states), len(self.states))
+        self.P = np.zeros(shape)
+        self.R = np.zeros(shape)
+        self.available = np.zeros(shape[:2], dtype=bool)
+        if entries:
+            a, s, s_next, p, r_next = (np.array(x) for x in zip(*entries))
+            a, s, s_next = (x.astype(int) for x in (a, s, s_next))
+            self.P[a, s, s_next] = p.astype(float)
+            self.R[a, s, s_next] = r_next.astype(float)
+        for s in self.states[:self.n]:
+            for a in T[s]:
+                self.available[action_index[a], state_index[s]] = True
+        # expected immediate rewards
+        self.PR = (self.P * self.R).sum(axis=-1)
+
+    def values(self, V):
+        # the next states which are not known to V take 0
+        known = set(V)
+        return np.array([V[s] if s in known or i < self.n else 0.0 for i, s in enumerate(self.states)], dtype=float)
+
+    def policy(self, policy):
+        pi = np.zeros(self.available.shape)
+        for j, s in enumerate(self.states[:self.n]):
+            for a, p in policy[s].items():
+                i = self.action_index.get(a, None)
+                if i is not None and self.available[i, j]:
+                    pi[i, j] = p
+        return pi
+
+    def q(self, v, g=0.999, norm_factor=1.0):
+        # g (and norm_factor) may be vectors over the leading (batch) dimension
+        g = np.expand_dims(np.asarray(g, dtype=float), (-1, -2))
+        norm_factor = np.expand_dims(np.asarray(norm_factor, dtype=float), (-1, -2))
+        return norm_factor * self.PR + g * np.matmul(self.P, v[..., None, :, None])[..., 0]
+
+    def greedy(self, q):
+        if not self.actions:
+            return np.zeros(q.shape[:-2] + q.shape[-1:], dtype=int)
+        return np.where(self.available, q, -math.inf).argmax(axis=-2)
+
+    def store(self, V, v):
+        for s, x in zip(self.states[:self.n], v[:self.n].tolist()):
+            V[s] = x
+        return V
+
+    def store_policy(self, policy, actions, instance=None):
+        # instance -- index into the batch of a stacked model
+        available = self.available if instance is None else self.available[instance if len(self.available) > 1 else 0]
+        updatable = available.any(axis=0)
+        for j, (s, i) in enumerate(zip(self.states[:self.n], actions[:self.n].tolist())):
+            if not updatable[j]:
+                continue
+            policy[s].clear()
+            policy[s][self.actions[i]] = 1
+        return policy
+
+    @classmethod
+    def stack(cls, models):
+        """ 
+        Stack of the models over a leading (batch) dimension with aligned states and actions.
+        
+        """
+        model = cls.__new__(cls)
+        model.states = list()
+        model.actions = list()
+        model.state_index = dict()
+        model.action_index = dict()
+        for m in models:
+            for s in m.states[:m.n]:
+                model.state_index.setdefault(s, len(model.state_index))
+        model.n = len(model.state_index)
+        for m in models:
+            for s in m.states[m.n:]:
+                model.state_index.setdefault(s, len(model.state_index))
+            for a in m.actions:
+                model.action_index.setdefault(a, len(model.action_index))
+        model.states = list(model.state_index)
+        model.actions = list(model.action_index)
+        shape = (len(models), len(model.actions), len(model.states), len(model.states))
+        model.P = np.zeros(shape)
+        model.R = np.zeros(shape)
+        model.available = np.zeros(shape[:3], dtype=bool)
+        for k, m in enumerate(models):
+            i = [model.action_index[a] for a in m.actions]
+            j = [model.state_index[s] for s in m.states]
+            model.P[k][np.ix_(i, j, j)] = m.P
+            model.R[k][np.ix_(i, j, j)] = m.R
+            model.available[k][np.ix_(i, j)] = m.available
+        model.PR = (model.P * model.R).sum(axis=-1)
+        return model
+
+def sweep_options(kwargs):
+    # options of the value iteration sweeps (see value_iteration)
+    return {k:kwargs[k] for k in ('stop', 'relative', 'gauss_seidel') if k in kwargs}
+
+def backup(available, q, pi=None):
+    # greedy (or pi-weighted) values of the q-values over the available actions
+    if pi is None:
+        return np.where(available, q, -math.inf).max(axis=-2, initial=-math.inf)
+    return (pi * np.where(available, q, 0.0)).sum(axis=-2)
+
+def value_iteration(model, v, pi=None, **kwargs):
+    """
+    stop -- 'sup' (max absolute change below eps) or 'span' (span of the change 
+    bounds the error of the greedy policy by eps) (default 'span' if relative else 'sup')
+    relative -- relative value iteration: the values are kept relative to the first 
+    updatable state and shifted back at the end (default False)
+    gauss_seidel -- in-place sweeps over the states in order (default False)
+    Note: with g=1 (average reward) the relative values (bias) are returned.
+    
+    """
+    steps = kwargs.get('steps', math.inf)
+    normalize = kwargs.get('normalize', False)
+    g = kwargs.get('g', 0.999)
+    eps = kwargs.get('eps', 1e-6)
+    relative = kwargs.get('relative', False)
+    stop = kwargs.get('stop', 'span' if relative else 'sup')
+    gauss_seidel = kwargs.get('gauss_seidel', False)
+    if stop not in ('sup', 'span'):
+        raise ValueError("Unknown stopping rule: {}".format(stop))
+    if stop == 'span' and gauss_seidel and not relative:
+        raise ValueError("The span stopping rule of the in-place sweeps needs the relative values.")
+
+    g = np.asarray(g, dtype=float)
+    norm_factor = np.asarray(1 - g if normalize else 1.0)
+    # states without any available action keep their values
+    updatable = np.broadcast_to(model.available.any(axis=-2), v.shape)
+    # the reference state of the relative values
+    ref = updatable.argmax(axis=-1)[..., None] if v.shape[-1] else np.zeros(v.shape[:-1] + (1,), dtype=int)
+    # the span (of the change) that bounds the error of the greedy policy by eps
+    discounted = g < 1
+    scale = np.where(discounted, g, 1.0) / np.where(discounted, 1 - g, 1.0)
+    threshold = np.where(discounted, eps / scale, eps) if stop == 'span' else eps
+    # each instance of a batch stops on its own
+    active = np.ones(v.shape[:-1], dtype=bool)
+    sweeps = np.zeros(v.shape[:-1], dtype=int)
+    offset = np.zeros(v.shape[:-1])
+    # the bounds of the change in the last sweep of each instance
+    low, high = np.zeros(v.shape[:-1]), np.zeros(v.shape[:-1])
+    while steps and active.any():
+        mask = updatable & active[..., None]
+        if gauss_seidel:
+            v_new = v.copy()
+            for i in range(model.n):
+                q_i = norm_factor[..., None] * model.PR[..., i] + \
+                      g[..., None] * np.einsum('...as,...s->...a', model.P[..., :, i, :], v_new)
+                x = backup(model.available[..., i:i+1], q_i[..., None], None if pi is None else pi[..., i:i+1])[..., 0]
+                if relative:
+                    # the offset is fixed by the reference state (the first to be updated)
+                    offset = np.where(active & (ref[..., 0] == i), x, offset)
+                    x = x - offset
+                v_new[..., i] = np.where(mask[..., i], x, v_new[..., i])
+        else:
+            v_new = np.where(mask, backup(model.available, model.q(v, g, norm_factor), pi), v)
+            if relative and v.shape[-1]:
+                offset = np.where(active, np.take_along_axis(v_new, ref, -1)[..., 0], offset)
+                v_new = np.where(mask, v_new - offset[..., None], v_new)
+        change = np.where(updatable, v_new - v, 0.0)
+        if stop == 'span':
+            sweep_low = np.where(updatable, change, math.inf).min(axis=-1, initial=math.inf)
+            sweep_high = np.where(updatable, change, -math.inf).max(axis=-1, initial=-math.inf)
+            sweep_low = np.where(np.isfinite(sweep_low), sweep_low, 0.0)
+            sweep_high = np.where(np.isfinite(sweep_high), sweep_high, 0.0)
+            delta = sweep_high - sweep_low
+            # the stopped instances keep the bounds of their last sweep
+            low, high = np.where(active, sweep_low, low), np.where(active, sweep_high, high)
+        else:
+            delta = np.abs(change).max(axis=-1, initial=0.0)
+        v = v_new
+        sweeps += active
+        active &= delta >= threshold
+        steps -= 1
+    if relative:
+        # the relative values shifted back by the discounted sum of the offset
+        v = np.where(updatable, v + np.where(discounted, offset / np.where(discounted, 1 - g, 1.0), 0.0)[..., None], v)
+    elif stop == 'span' and sweeps.any():
+        # the midpoint of the bounds on the values
+        v = np.where(updatable, v + np.where(discounted, scale * (low + high) / 2, 0.0)[..., None], v)
+    return v, sweeps
+
+def policy_evaluation(model, v, pi=None, **kwargs):
+    """
+    method -- 'iterative' (value iteration), 'direct' (dense linear solve), 
+    'krylov' (sparse iterative linear solve) or 'auto' (default 'iterative')
+    direct_max -- largest number of states solved by 'direct' in 'auto' (default 1000)
+    Note: a missing policy is replaced by the greedy policy of v for the linear solves.
+    
+    """
+    method = kwargs.get('method', 'iterative')
+    if method == 'iterative':
+        return value_iteration(model, v, pi, steps=kwargs.get('vi_steps', math.inf), g=kwargs.get('g', 0.999), 
+                               eps=kwargs.get('eps', 1e-6), normalize=kwargs.get('normalize', False), 
+                               **sweep_options(kwargs))[0]
+    g = np.asarray(kwargs.get('g', 0.999), dtype=float)
+    normalize = kwargs.get('normalize', False)
+    norm_factor = 1 - g if normalize else 1
+    if pi is None:
+        pi = np.zeros(v.shape[:-1] + model.available.shape[-2:])
+        np.put_along_axis(pi, model.greedy(model.q(v, g, norm_factor))[..., None, :], 1.0, axis=-2)
+    # solve (I - g P_pi) v = R_pi where the states without any available action keep their values
+    updatable = model.available.any(axis=-2)
+    R_pi = np.expand_dims(norm_factor, -1) * (pi * model.PR).sum(axis=-2)
+    b = np.where(updatable, R_pi, v)
+    if method == 'auto':
+        method = 'direct' if v.shape[-1] <= kwargs.get('direct_max', 1000) else 'krylov'
+    if method == 'krylov':
+        try:
+            import scipy.sparse
+            import scipy.sparse.linalg
+        except ImportError:
+            method = 'direct'
+        else:
+            n = v.shape[-1]
+            b = np.broadcast_to(b, np.broadcast_shapes(b.shape, v.shape, pi.shape[:-2] + (n,)))
+            v = np.broadcast_to(v, b.shape).copy()
+            P = np.broadcast_to(model.P, b.shape[:-1] + model.P.shape[-3:])
+            pi = np.broadcast_to(pi, b.shape[:-1] + pi.shape[-2:])
+            g_k = np.broadcast_to(g, b.shape[:-1])
+            for k in np.ndindex(b.shape[:-1]):
+                # I - g P_pi from the nonzero transitions only (the duplicates are summed)
+                a, s, t = np.nonzero(P[k])
+                P_pi = scipy.sparse.coo_matrix((pi[k][a, s] * P[k][a, s, t], (s, t)), shape=(n, n))
+                A = (scipy.sparse.identity(n, format='csr') - g_k[k] * P_pi.tocsr()).tocsr()
+                # the error of the values is bounded by eps (the residual is not relative to b)
+                x, info = scipy.sparse.linalg.gmres(A, b[k], x0=v[k], rtol=0.0, 
+                                                    atol=kwargs.get('eps', 1e-6) * max(1 - g_k[k], 1e-12))
+                if info:
+                    raise RuntimeError("The Krylov solver did not converge (info={}).".format(info))
+                v[k] = x
+            return v
+    if method == 'direct':
+        P_pi = np.einsum('...as,...ast->...st', pi, model.P)
+        A = np.eye(v.shape[-1]) - np.expand_dims(g, (-1, -2)) * P_pi
+        return np.linalg.solve(A, b[..., None])[..., 0]
+    raise ValueError("Unknown evaluation method: {}".format(method))
+
+def policy_iteration(model, v, pi, **kwargs):
+    steps = kwargs.get('steps', math.inf)
+    vi_steps = kwargs.get('vi_steps', math.inf)
+    g = kwargs.get('g', 0.999)
+    eps = kwargs.get('eps', 1e-6)
+    normalize = kwargs.get('normalize', False)
+    method = kwargs.get('method', 'iterative')
+
+    norm_factor = 1 - np.asarray(g) if normalize else 1
+    updatable = model.available.any(axis=-2)
+    # no policy (yet) means the greedy evaluation
+    actions = model.greedy(model.q(v, g, norm_factor)) if pi is None else pi.argmax(axis=-2)
+    # each instance of a batch is counted on its own
+    stable = np.zeros(v.shape[:-1], dtype=bool)
+    iterations = np.zeros(v.shape[:-1], dtype=int)
+    while steps and not stable.all():
+        v = policy_evaluation(model, v, pi, method=method, vi_steps=vi_steps, g=g, eps=eps, normalize=normalize, 
+                              **sweep_options(kwargs))
+        actions = model.greedy(model.q(v, g, norm_factor))
+        pi_new = np.zeros(v.shape[:-1] + model.available.shape[-2:])
+        np.put_along_axis(pi_new, actions[..., None, :], 1.0, axis=-2)
+        iterations += ~stable
+        if pi is not None:
+            pi_new = np.where(updatable[..., None, :], pi_new, pi)
+            stable = (pi_new == pi).all(axis=(-1, -2))
+        pi = pi_new
+        steps -= 1
+    return v, pi, actions, iterations
 
 def VITabular(T, r, V=None, policy=None, **kwargs):
     steps = kwargs.get('steps', math.inf)
@@ -12,6 +316,14 @@ def VITabular(T, r, V=None, policy=None, **kwargs):
     if not isinstance(V, grl.Storage):
         V = grl.Storage(1, default=0, leaf_keys=T.keys())
 
+    # compiled (matrix-form) sweeps
+    if kwargs.get('compiled', True):
+        model = kwargs.get('model', None) or TabularModel(T, r)
+        pi = model.policy(policy) if policy else None
+        v, _ = value_iteration(model, model.values(V), pi, steps=steps, g=g, eps=eps, normalize=normalize, 
+                               **sweep_options(kwargs))
+        return model.store(V, v)
+
     done = False
     while steps and not done:
         delta = 0
@@ -33,6 +345,8 @@ def PITabular(T, r, V=None, policy=None, **kwargs):
     g = kwargs.get('g', 0.999)
     eps = kwargs.get('eps', 1e-6)
     normalize = kwargs.get('normalize', False)
+    # evaluation method of the compiled iterations (see policy_evaluation)
+    method = kwargs.get('method', 'iterative')
 
     if not isinstance(policy, grl.Storage):
         actions = set(a for s in T.keys() for a in T[s].keys())
@@ -41,6 +355,15 @@ def PITabular(T, r, V=None, policy=None, **kwargs):
     if not isinstance(V, grl.Storage):
         V = grl.Storage(1, default=0, leaf_keys=T.keys())
 
+    # compiled (matrix-form) iterations
+    if kwargs.get('compiled', True):
+        model = kwargs.get('model', None) or TabularModel(T, r)
+        pi = model.policy(policy) if policy else None
+        v, _, actions, _ = policy_iteration(model, model.values(V), pi, 
+                                            steps=steps, vi_steps=vi_steps, g=g, eps=eps, normalize=normalize, **sweep_options(kwargs), 
+                                            method=method)
+        return model.store_policy(policy, actions), model.store(V, v)
+
     stable = False
     while steps and not stable:
         V = VITabular(T, r, V, policy, steps=vi_steps, g=g, eps=eps, normalize=normalize)
@@ -55,3 +378,115 @@ def PITabular(T, r, V=None, policy=None, **kwargs):
                 stable = False
         steps -= 1
     return policy, V
+
+def batch_model(models, g):
+    # a single model is broadcast against a vector of discounts
+    models = [m if isinstance(m, TabularModel) else TabularModel(*m) for m in models]
+    model = TabularModel.stack(models)
+    K = max(len(models), np.size(g))
+    return model, np.zeros((K, len(model.states)))
+
+def VIBatch(models, **kwargs):
+    """ 
+    Value iteration over a batch of MDPs sharing a single sweep loop.
+    
+    models -- list of (T, r) pairs or TabularModels, or a single one with a vector of discounts g
+    Returns a list of the value Storages and the number of sweeps of each instance.
+    
+    """
+    g = kwargs.get('g', 0.999)
+    model, v = batch_model(models, g)
+    v, sweeps = value_iteration(model, v, None, steps=kwargs.get('steps', math.inf), g=g, 
+                                eps=kwargs.get('eps', 1e-6), normalize=kwargs.get('normalize', False), 
+                                **sweep_options(kwargs))
+    V = [model.store(grl.Storage(1, default=0, leaf_keys=model.states[:model.n]), v_k) for v_k in v]
+    return V, sweeps
+
+def PIBatch(models, **kwargs):
+    """ 
+    Policy iteration over a batch of MDPs sharing a single iteration loop.
+    
+    models -- list of (T, r) pairs or TabularModels, or a single one with a vector of discounts g
+    Returns lists of the policy and value Storages and the number of iterations of each instance.
+    
+    """
+    g = kwargs.get('g', 0.999)
+    model, v = batch_model(models, g)
+    v, _, actions, iterations = policy_iteration(model, v, None, steps=kwargs.get('steps', math.inf), 
+                                                 vi_steps=kwargs.get('vi_steps', math.inf), g=g, 
+                                                 eps=kwargs.get('eps', 1e-6), normalize=kwargs.get('normalize', False), 
+                                                 **sweep_options(kwargs), method=kwargs.get('method', 'iterative'))
+    policy, V = list(), list()
+    for k, (v_k, actions_k) in enumerate(zip(v, actions)):
+        pi_k = grl.Storage(2, default=1/max(len(model.actions), 1), leaf_keys=model.actions)
+        policy.append(model.store_policy(pi_k, actions_k, k))
+        V.append(model.store(grl.Storage(1, default=0, leaf_keys=model.states[:model.n]), v_k))
+    return policy, V, iterations
+
+
+class PrioritizedSweeping:
+
+    """
+    Incremental planner over a (changing) tabular model T[s][a][s'] and r[s][a][s'].
+    It keeps V and policy between the calls and only backs up the states affected by 
+    the changed (s, a) rows, ordered by their Bellman errors, within a budget of backups per call.
+    g -- discount factor (default 0.999)
+    budget -- maximum number of backups per call of plan() (default 10)
+    theta -- smallest priority to back up (default 1e-6)
+    Note: the policy is kept in the same (deterministic) format as PITabular.
+    
+    """
+
+    def __init__(self, T, r, V=None, policy=None, **kwargs):
+        self.T = T
+        self.r = r
+        self.g = kwargs.get('g', 0.999)
+        self.budget = kwargs.get('budget', 10)
+        self.theta = kwargs.get('theta', 1e-6)
+        self.V = V if isinstance(V, grl.Storage) else grl.Storage(1, default=0)
+        self.policy = policy if isinstance(policy, grl.Storage) else grl.Storage(2, default=1)
+        self.predecessors = collections.defaultdict(set)
+        self.queue = list()
+        self.priority = dict()
+        self.counter = itertools.count()
+
+    def q(self, s, a):
+        row_r = self.r[s][a]
+        return sum(p * (row_r[s_next] + self.g * self.V[s_next]) for s_next, p in self.T[s][a].items())
+
+    def push(self, s, priority):
+        if priority > max(self.theta, self.priority.get(s, 0.0)):
+            self.priority[s] = priority
+            heapq.heappush(self.queue, (-priority, next(self.counter), s))
+
+    # notify the planner about a changed (s, a) row of the model
+    def update(self, s, a):
+        for s_next in self.T[s][a]:
+            self.predecessors[s_next].add(s)
+        q = {b:self.q(s, b) for b in self.T[s]}
+        self.push(s, abs(max(q.values()) - self.V[s]))
+
+    def backup(self, s):
+        q = {a:self.q(s, a) for a in self.T[s]}
+        a_max = max(q, key=q.get)
+        delta = abs(q[a_max] - self.V[s])
+        self.V[s] = q[a_max]
+        self.policy[s].clear()
+        self.policy[s][a_max] = 1
+        return delta
+
+    def plan(self, budget=None):
+        budget = self.budget if budget is None else budget
+        while self.queue and budget:
+            priority, _, s = heapq.heappop(self.queue)
+            # skip the stale entries
+            if self.priority.get(s, None) != -priority:
+                continue
+            del self.priority[s]
+            delta = self.backup(s)
+            budget -= 1
+            # the (estimated) change of the Bellman errors of the predecessors
+            for s_prev in self.predecessors[s]:
+                p = max(p for a in self.T[s_prev] for s_next, p in self.T[s_prev][a].items() if s_next == s)
+                self.push(s_prev, self.g * delta * p)
+        return self.policy, self.V
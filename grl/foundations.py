@@ -9,6 +9,8 @@ import enum
 __all__ = ['GRLObject', 'Domain', 'Agent', 'BinaryMock', 'EventType', 'Event']
 
 class Event:
+    __slots__ = ('type', 'data')
+
     def __init__(self, event_type, data):
         self.type = event_type
         self.data = data
@@ -37,17 +39,30 @@ class GRLObject(abc.ABC):
             # the object will keep its own history
             self.keep_history = True
             # the initiated history manager uses the internal state_func to get states from histories
-            self.hm = grl.HistoryManager(maxlen=self.kwargs.get('max_history', None), state_map=self.state_func)
+            self.hm = grl.HistoryManager(maxlen=self.kwargs.get('max_history', None), state_map=self.state_func, 
+                                         overlay=self.kwargs.get('overlay', True), 
+                                         cache_size=self.kwargs.get('state_cache_size', 0))
         self.sm = grl.StateManager(self.transition_func)
         self.am = grl.ActionManager()
         self.pm = grl.PerceptManager(self.emission_func)
-        self.rm = grl.RewardManager(self.reward_func)
+        self.rm = grl.RewardManager(self.reward_func, self.kwargs.get('overlay', True))
         # the order is important if the objects are interacting in a sequence
         self.order = self.kwargs.get('order', math.nan)
+        # the random number generators of the object
+        # (default: a seed drawn from the global random, i.e. the global seeding still controls the run)
+        self.seed = self.kwargs.get('seed', None)
+        if self.seed is None:
+            self.seed = random.getrandbits(64)
+        self.random = random.Random(self.seed)
+        self.np_random = np.random.default_rng(self.seed)
+        # the profiler of the entry points (default: no profiling, see grl.profile)
+        self.profiler = None
         # call the setup function for any object-dependent user-specified configurations
         # from a user perspective, setup() is the entry point of an object
         # the user should not use the internal __init__
         self.setup()
+        if grl.profiling.active is not None:
+            grl.profiling.active.attach(self)
     
     # first (auto) function call after __init__
     # the user should use this "public" function as an initialization function instead of __init__
@@ -90,6 +105,16 @@ class Domain(GRLObject):
     # in addition to the interface provided by GRLObject
     # the domain object provides the following abstract functions
 
+    def __init__(self, history_mgr=None, *args, **kwargs):
+        # cache of the oracle results (default: 0:oracle_cache_size, i.e. no cache)
+        # WARNING! The cached results are shared between the callers.
+        # (set before the object is initiated, i.e. the setup and the profiler see the cached oracle)
+        self.oracle_cache = None
+        if kwargs.get('oracle_cache_size', 0):
+            self.oracle_cache = grl.StateCache(kwargs['oracle_cache_size'])
+            self.oracle = self.cached_oracle
+        super().__init__(history_mgr, *args, **kwargs)
+
     # this function "activates" the object
     @abc.abstractmethod
     def start(self, a=None, order=1):
@@ -105,6 +130,33 @@ class Domain(GRLObject):
     def oracle(self, h, *args, **kwargs):
         raise NotImplementedError
 
+    # the key of an oracle result: the (end of the) history, the state of the domain and the arguments
+    # (the index and the extension are already applied to the history)
+    # the domains with other dependencies should extend the key (None: no caching)
+    def oracle_key(self, h, *args, **kwargs):
+        items = tuple(item for item in sorted(kwargs.items()) if item[0] not in ('index', 'extension'))
+        key = (h.t, tuple(h.window(1)), self.sm.state, self.sm.hm.h.t, tuple(self.sm.hm.h.window(1)), args, items)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def cached_oracle(self, h, *args, **kwargs):
+        key = self.oracle_key(h, *args, **kwargs)
+        if key is None:
+            return type(self).oracle(self, h, *args, **kwargs)
+        q = self.oracle_cache.get(key, self.oracle_cache)
+        if q is self.oracle_cache:
+            q = type(self).oracle(self, h, *args, **kwargs)
+            self.oracle_cache.put(key, q)
+        return q
+
+    # explicit invalidation of the cached oracle results
+    def invalidate_oracle(self):
+        if self.oracle_cache is not None:
+            self.oracle_cache.clear()
+
 class Agent(GRLObject):
    
     # default: interacting with only one domain
@@ -117,6 +169,10 @@ class Agent(GRLObject):
 
         # WARNING! Be mindful when using oracles. They are super powerful!
         self.oracle = domain.oracle # agent has access to the oracle of the domain
+        # (the oracle of a domain with the same profiler is already timed)
+        if self.profiler is not None:
+            self.profiler.attach(self.rm)
+            self.profiler.wrap(self, 'oracle', 'oracle')
         
     @abc.abstractmethod
     def start(self, e=None, order=0):
@@ -145,7 +201,7 @@ class BinaryMock(Domain):
         self.order = order
         # Design Choice: Ignore the starting binary input and 
         # take a random action on the hooked domain
-        a_org = None if a == None else random.sample(self.ext_actions, 1)[0]
+        a_org = None if a == None else self.random.sample(self.ext_actions, 1)[0]
         self.prev_e = self.domain.start(a_org)
         if a_org == None:
             self.hm_ae.record([self.prev_e])
@@ -206,6 +262,13 @@ class BinaryMock(Domain):
         q_bin = g ** (self.d - self.sm.state - 1) * q_bin
         return q_bin
 
+    def oracle_key(self, h, *args, **kwargs):
+        # the oracle also depends on the binary prefix and the history of the hooked domain
+        key = super().oracle_key(h, *args, **kwargs)
+        if key is None:
+            return None
+        return key + (tuple(self.b), self.hm_ae.h.t, tuple(self.hm_ae.h.window(1)))
+
     def restricted_action_space(self, b_vector, b):
         b_key = ''.join(str(x) for x in b_vector) + str(b)
         if self.restrict_A_cache.get(b_key, None):
@@ -4,8 +4,11 @@ import numpy as np
 import random
 import copy
 import math
+import operator
+import heapq
+import itertools
 
-__all__ = ['Storage']
+__all__ = ['Storage', 'DenseStorage', 'FlatStorage']
 
 class Storage(collections.MutableMapping):
 
@@ -15,6 +18,8 @@ class Storage(collections.MutableMapping):
     Note: a tuple of length at least 2 will be considered as a range
     leaf_keys -- list of leaf keys (default None)
     persist -- persist the access-initialized variable (default True)
+    indexed -- keep the extremums of the leaves up to date on each change (default False)
+    Note: queries on an indexed storage do not materialize the missing keys
     data -- set any initial data (default None)
     
     """
@@ -31,6 +36,8 @@ class Storage(collections.MutableMapping):
         self.dimensions = dimensions
         self.storage = dict()
         self.persist = self.kwargs.get('persist', True)
+        self.indexed = self.kwargs.get('indexed', False)
+        self.extremum = Extremum() if self.indexed and self.dimensions == 1 else None
         
         self.set_default(self.kwargs.get('default', [None]))
         self.set_leaf_keys(self.kwargs.get('leaf_keys', None))
@@ -53,6 +60,8 @@ class Storage(collections.MutableMapping):
         self.storage[key] = value
         if self.missing_keys: 
             self.missing_keys.discard(key)
+        if self.extremum:
+            self.extremum.push(self.storage, key)
 
     def __getitem__(self, key):
         try:
@@ -63,6 +72,7 @@ class Storage(collections.MutableMapping):
                             default=self.default, 
                             leaf_keys=self.leaf_keys, 
                             persist=self.persist, 
+                            indexed=self.indexed,
                             parent=self,
                             key=key)
                 self.storage[key] = v 
@@ -75,6 +85,8 @@ class Storage(collections.MutableMapping):
                 # storage is persistant, hance remove the key
                 elif self.missing_keys:
                     self.missing_keys.discard(key)
+                if self.persist and self.extremum:
+                    self.extremum.push(self.storage, key)
             return v           
 
     def __delitem__(self, key):
@@ -82,6 +94,8 @@ class Storage(collections.MutableMapping):
             del self.storage[key]
         except KeyError:
             pass
+        if self.extremum:
+            self.extremum.remove(key)
 
     def __iter__(self):
         for key in self.storage.keys():
@@ -97,62 +111,194 @@ class Storage(collections.MutableMapping):
     def __repr__(self):
         return dict.__repr__(self.storage)
 
-    def operate(self, other, operation):
+    # 1-dimensional operations at least this long are carried out as numpy array operations
+    vectorize_min = 64
+
+    def operate(self, other, operation, reflected=False):
+        stored = self.storage
         if self.dimensions != 1:
-            raise RuntimeError("TODO: This operation is not supported at {}-dimensional storage yet!".format(self.dimensions))
-        # TODO: find a way to get rid of these for-loops.
-        data = copy.deepcopy(self.storage)
+            data = dict()
+            if isinstance(other, collections.Mapping):
+                for k in stored:
+                    try:
+                        data[k] = stored[k].operate(other[k], operation, reflected)
+                    except KeyError:
+                        data[k] = stored[k].operate(dict(), operation, reflected)
+            else:
+                for k in stored:
+                    data[k] = stored[k].operate(other, operation, reflected)
+            return self.spawn(data)
+        # the missing keys take the default value (without materializing them in self)
+        keys = list(stored)
+        values = list(stored.values())
+        missing = list(self.missing_keys)
+        keys += missing
+        values += [self.default_value() for _ in missing]
         if not isinstance(other, collections.Mapping):
-            for k in self.storage:
-                data[k] = operation(self[k], other)
-            missing = copy.deepcopy(self.missing_keys)
-            for k in missing:
-                data[k] = operation(self[k], other)
+            others = [other] * len(keys)
         else:
-            for k in self.storage:
+            # align the keys of the other operand with the keys of this storage 
+            others = list()
+            aligned = list()
+            for i, k in enumerate(keys):
                 try:
-                    data[k] = operation(self[k], other[k])
+                    others.append(other[k])
+                    aligned.append(i)
                 except KeyError:
                     pass
-            missing = copy.deepcopy(self.missing_keys)
-            for k in missing:
+            if len(aligned) != len(keys):
+                data = dict(zip(keys[:len(stored)], values))
+                keys = [keys[i] for i in aligned]
+                values = [values[i] for i in aligned]
+                data.update(zip(keys, self.apply(values, others, operation, reflected)))
+                return self.spawn(data)
+        return self.spawn(dict(zip(keys, self.apply(values, others, operation, reflected))))
+
+    def ioperate(self, other, operation):
+        # in-place operation: only the touched keys are updated
+        if self.dimensions != 1:
+            for k, v in self.storage.items():
                 try:
-                    data[k] = operation(self[k], other[k])
+                    v.ioperate(other[k] if isinstance(other, collections.Mapping) else other, operation)
                 except KeyError:
                     pass
-        return Storage(self.dimensions, data, *self.args, **self.kwargs)
+            return self
+        stored = self.storage
+        keys = list(stored) + list(self.missing_keys)
+        if isinstance(other, collections.Mapping):
+            others = list()
+            aligned = list()
+            for k in keys:
+                try:
+                    others.append(other[k])
+                    aligned.append(k)
+                except KeyError:
+                    pass
+            keys = aligned
+        else:
+            others = [other] * len(keys)
+        values = [stored[k] if k in stored else self.default_value() for k in keys]
+        self.assign(keys, self.apply(values, others, operation))
+        return self
+
+    def assign(self, keys, values):
+        self.storage.update(zip(keys, values))
+        if self.missing_keys:
+            self.missing_keys.difference_update(keys)
+        if self.extremum:
+            self.extremum.rebuild(self.storage)
+
+    def apply(self, values, others, operation, reflected=False):
+        if reflected:
+            values, others = others, values
+        if len(values) >= self.vectorize_min and operation in self.vectorized:
+            x, y = np.array(values), np.array(others)
+            # only the operations with the same results as Python's are vectorized (e.g. no division by zero)
+            if x.shape == y.shape and self.exact(x, values) and self.exact(y, others) and \
+               (operation is not operator.truediv or y.all()):
+                return operation(x, y).tolist()
+        return list(map(operation, values, others))
+
+    # the operations of the floats (IEEE) and the small integers (no overflow) are the same in Python and numpy
+    vectorized = (operator.add, operator.sub, operator.mul, operator.truediv)
+
+    @staticmethod
+    def exact(array, values):
+        if array.dtype.kind == 'f':
+            # no integers mixed with the floats (e.g. int + int is an int)
+            return all(isinstance(v, float) for v in values)
+        return array.dtype.kind == 'i' and (not len(array) or np.abs(array).max() < 2**26)
+
+    def spawn(self, data):
+        # a new (detached) storage with the same configuration holding the given data
+        s = Storage(self.dimensions, None, 
+                       default=self.default, 
+                       leaf_keys=self.leaf_keys, 
+                       persist=self.persist,
+                       indexed=self.indexed)
+        s.storage = data
+        if self.dimensions > 1:
+            for k, v in data.items():
+                v.parent = s
+                v.key = k
+        else:
+            if s.missing_keys:
+                s.missing_keys.difference_update(data)
+            if s.extremum:
+                s.extremum.rebuild(data)
+        return s
 
     def __add__(self, other):
-        return self.operate(other, lambda x, y: x + y)
-    __radd__ = __add__
+        return self.operate(other, operator.add)
+
+    def __radd__(self, other):
+        return self.operate(other, operator.add, reflected=True)
 
     def __sub__(self, other):
-        return self.operate(other, lambda x, y: x - y)
-    __rsub__ = __sub__
+        return self.operate(other, operator.sub)
+
+    def __rsub__(self, other):
+        return self.operate(other, operator.sub, reflected=True)
 
     def __mul__(self, other):
-        return self.operate(other, lambda x, y: x * y)
-    __rmul__ = __mul__
+        return self.operate(other, operator.mul)
+
+    def __rmul__(self, other):
+        return self.operate(other, operator.mul, reflected=True)
     
     def __matmul__(self, other):
-        return self.operate(other, lambda x, y: x @ y)
-    __rmatmul__ = __matmul__
+        return self.operate(other, operator.matmul)
+
+    def __rmatmul__(self, other):
+        return self.operate(other, operator.matmul, reflected=True)
     
     def __mod__(self, other):
-        return self.operate(other, lambda x, y: x % y)
-    __rmod__ = __mod__
+        return self.operate(other, operator.mod)
+
+    def __rmod__(self, other):
+        return self.operate(other, operator.mod, reflected=True)
 
     def __truediv__(self, other):
-        return self.operate(other, lambda x, y: x / y)
-    __rtruediv__ = __truediv__
+        return self.operate(other, operator.truediv)
+
+    def __rtruediv__(self, other):
+        return self.operate(other, operator.truediv, reflected=True)
 
     def __floordiv__(self, other):
-        return self.operate(other, lambda x, y: x // y)
-    __rfloordiv__ = __floordiv__
+        return self.operate(other, operator.floordiv)
+
+    def __rfloordiv__(self, other):
+        return self.operate(other, operator.floordiv, reflected=True)
 
     def __pow__(self, other):
-        return self.operate(other, lambda x, y: x ** y)
-    __rpow__ = __pow__
+        return self.operate(other, operator.pow)
+
+    def __rpow__(self, other):
+        return self.operate(other, operator.pow, reflected=True)
+
+    def __iadd__(self, other):
+        return self.ioperate(other, operator.add)
+
+    def __isub__(self, other):
+        return self.ioperate(other, operator.sub)
+
+    def __imul__(self, other):
+        return self.ioperate(other, operator.mul)
+
+    def __imatmul__(self, other):
+        return self.ioperate(other, operator.matmul)
+
+    def __imod__(self, other):
+        return self.ioperate(other, operator.mod)
+
+    def __itruediv__(self, other):
+        return self.ioperate(other, operator.truediv)
+
+    def __ifloordiv__(self, other):
+        return self.ioperate(other, operator.floordiv)
+
+    def __ipow__(self, other):
+        return self.ioperate(other, operator.pow)
 
     def sum(self):
         if self.dimensions == 1:
@@ -165,7 +311,11 @@ class Storage(collections.MutableMapping):
 
     def max(self):
         if self.dimensions == 1:
-            max_v = max(self.storage.values(), default=max(self.default))
+            if self.extremum:
+                max_key = self.extremum.max(self.storage)
+                max_v = max(self.default) if max_key is None else self.storage[max_key]
+            else:
+                max_v = max(self.storage.values(), default=max(self.default))
             if len(self.missing_keys) and max_v < max(self.default):
                 max_v = max(self.default)
             return max_v
@@ -177,6 +327,11 @@ class Storage(collections.MutableMapping):
     
     def argmax(self):
         if self.dimensions == 1:
+            if self.extremum:
+                max_key = self.extremum.max(self.storage)
+                if len(self.missing_keys) and (max_key is None or self.storage[max_key] < max(self.default)):
+                    max_key = random.sample(self.missing_keys, 1)[0]
+                return max_key
             try: 
                 max_key = max(self, key=self.get)
             except ValueError: 
@@ -187,7 +342,11 @@ class Storage(collections.MutableMapping):
 
     def min(self):
         if self.dimensions == 1:
-            min_v = min(self.storage.values(), default=min(self.default))
+            if self.extremum:
+                min_key = self.extremum.min(self.storage)
+                min_v = min(self.default) if min_key is None else self.storage[min_key]
+            else:
+                min_v = min(self.storage.values(), default=min(self.default))
             if len(self.missing_keys) and min_v > min(self.default):
                 min_v = min(self.default)
             return min_v
@@ -199,6 +358,11 @@ class Storage(collections.MutableMapping):
     
     def argmin(self):
         if self.dimensions == 1:
+            if self.extremum:
+                min_key = self.extremum.min(self.storage)
+                if len(self.missing_keys) and (min_key is None or self.storage[min_key] > min(self.default)):
+                    min_key = random.sample(self.missing_keys, 1)[0]
+                return min_key
             try: 
                 min_key = min(self, key=self.get)
             except ValueError: 
@@ -209,6 +373,8 @@ class Storage(collections.MutableMapping):
 
     def purge(self, child_key):
         self.storage.pop(child_key, None)
+        if self.extremum:
+            self.extremum.remove(child_key)
         if not len(self.storage) and self.parent:
             self.parent.purge(self.key)
  
@@ -228,3 +394,682 @@ class Storage(collections.MutableMapping):
                 return (self * p).sum()
             else:
                 return self.sum() / (len(self) + len(self.missing_keys))
+
+
+class Extremum:
+
+    """
+    Lazy-deletion max/min heaps over the values of a dict.
+    Ties are broken by the insertion order of the keys, i.e. the same as max(d, key=d.get).
+    
+    """
+
+    def __init__(self):
+        self.counter = itertools.count()
+        self.order = dict()
+        self.max_heap = list()
+        self.min_heap = list()
+
+    def rebuild(self, data):
+        self.order = {k:next(self.counter) for k in data}
+        self.max_heap = [(-v, self.order[k], k) for k, v in data.items()]
+        self.min_heap = [(v, self.order[k], k) for k, v in data.items()]
+        heapq.heapify(self.max_heap)
+        heapq.heapify(self.min_heap)
+
+    def push(self, data, key):
+        seq = self.order.setdefault(key, next(self.counter))
+        heapq.heappush(self.max_heap, (-data[key], seq, key))
+        heapq.heappush(self.min_heap, (data[key], seq, key))
+        # drop the stale entries once they dominate the heaps
+        if len(self.max_heap) > 2 * len(data) + 8:
+            self.rebuild(data)
+
+    def remove(self, key):
+        self.order.pop(key, None)
+
+    def max(self, data):
+        return self.top(self.max_heap, data, -1)
+
+    def min(self, data):
+        return self.top(self.min_heap, data, 1)
+
+    def top(self, heap, data, sign):
+        while heap:
+            v, seq, k = heap[0]
+            if self.order.get(k, None) == seq and sign * data[k] == v:
+                return k
+            heapq.heappop(heap)
+        return None
+
+
+class DenseStorage(Storage):
+
+    """
+    A Storage backed by contiguous numpy arrays. It keeps the Storage indexing 
+    and API, but every level shares the same arrays, i.e. storage[s][a] is a 
+    light view on the block of the values instead of a separate object.
+    dimensions -- storage dimensions (default 2)
+    default -- list of initial values (default [0.0])
+    Note: a tuple of length at least 2 will be considered as a range
+    leaf_keys -- list of leaf keys (default None)
+    keys -- list of known keys for the non-leaf dimensions, e.g. [states, actions] (default None)
+    capacity -- initial capacity of a dimension with unknown keys (default 8)
+    dtype -- data type of the values (default float)
+    persist -- persist the access-initialized variable (default True)
+    data -- set any initial data (default None)
+    Note: the keys are mapped to indices on first access and the arrays grow as needed.
+    Note: the arrays are dense, i.e. the memory grows with the product of the numbers of keys.
+    
+    """
+
+    def __init__(self, dimensions=2, data=None, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+        # internal parameters
+        self.parent = None
+        self.key = None
+        self.root = self
+        self.prefix = tuple()
+        self.default_range = False
+
+        self.dimensions = dimensions
+        self.persist = self.kwargs.get('persist', True)
+        self.dtype = self.kwargs.get('dtype', float)
+
+        # key <-> index maps of each dimension
+        self.index = [dict() for _ in range(dimensions)]
+        self.labels = [list() for _ in range(dimensions)]
+        keys = list(self.kwargs.get('keys', None) or list())
+        keys += [list()] * (dimensions - len(keys))
+        if self.kwargs.get('leaf_keys', None):
+            keys[-1] = list(keys[-1]) + [k for k in self.kwargs['leaf_keys'] if k not in keys[-1]]
+        shape = tuple(max(len(k), self.kwargs.get('capacity', 8)) for k in keys)
+        self.values = np.zeros(shape, dtype=self.dtype)
+        self.stored = np.zeros(shape, dtype=bool) # explicitly stored cells
+        self.seen = np.zeros(shape, dtype=bool) # cells which are not missing anymore
+        self.leaf = np.zeros(shape[-1], dtype=bool) # indices of the leaf keys
+        # existing (i.e. accessed) children of each non-leaf dimension
+        self.nodes = [np.zeros(shape[:d + 1], dtype=bool) for d in range(dimensions - 1)]
+        self.children = dict() # key -> view of the existing children
+        for d, dim_keys in enumerate(keys):
+            for k in dim_keys:
+                self.locate(d, k)
+
+        self.set_default(self.kwargs.get('default', [0.0]))
+        self.set_leaf_keys(self.kwargs.get('leaf_keys', None))
+
+        if data:
+            self.update(data)
+
+    def view(self, index, key):
+        # the views of the existing children are kept, i.e. an access to a child does not build it again
+        v = self.children.get(key, None)
+        if v is None:
+            v = object.__new__(DenseView)
+            v.root = self.root
+            v.prefix = self.prefix + (index,)
+            v.parent = self
+            v.key = key
+            v.children = dict()
+            self.children[key] = v
+            self.root.nodes[len(v.prefix) - 1][v.prefix] = True
+        return v
+
+    def locate(self, dimension, key):
+        root = self.root
+        i = root.index[dimension].get(key, None)
+        if i is None:
+            i = len(root.labels[dimension])
+            root.labels[dimension].append(key)
+            root.index[dimension][key] = i
+            if i >= root.values.shape[dimension]:
+                root.grow(dimension)
+        return i
+
+    def grow(self, dimension):
+        # double the capacity of a dimension (amortized O(1) per new key)
+        pad = [(0, 0)] * self.values.ndim
+        pad[dimension] = (0, max(self.values.shape[dimension], 1))
+        self.values = np.pad(self.values, pad)
+        self.stored = np.pad(self.stored, pad)
+        self.seen = np.pad(self.seen, pad)
+        self.nodes = [np.pad(n, pad[:n.ndim]) if dimension < n.ndim else n for n in self.nodes]
+        if dimension == self.values.ndim - 1:
+            self.leaf = np.pad(self.leaf, pad[-1:])
+
+    @property
+    def block(self):
+        # index of the (sub-)array covered by this storage
+        root = self.root
+        return self.prefix + tuple(slice(0, len(l)) for l in root.labels[len(self.prefix):])
+
+    @property
+    def missing(self):
+        # mask of the missing leaf keys in the covered rows
+        root = self.root
+        leaf = root.leaf[:len(root.labels[-1])]
+        block = self.block
+        if self.dimensions == 1:
+            return leaf & ~root.seen[block]
+        # the leaf keys are missing in the existing rows
+        return leaf & ~root.seen[block] & root.nodes[-1][block[:-1]][..., None]
+
+    @property
+    def missing_keys(self):
+        if self.dimensions != 1:
+            return set() if not self.leaf_keys else set(self.leaf_keys)
+        labels = self.root.labels[-1]
+        return set(labels[i] for i in np.flatnonzero(self.missing))
+
+    def set_leaf_keys(self, keys):
+        root = self.root
+        root.leaf[:] = False
+        for k in keys or list():
+            root.leaf[root.locate(root.dimensions - 1, k)] = True
+        root.leaf_keys = keys
+        self.leaf_keys = keys
+
+    def set_default(self, default):
+        super().set_default(default)
+        if self.root is not self:
+            self.root.set_default(default)
+
+    def __setitem__(self, key, value):
+        root = self.root
+        i = self.locate(len(self.prefix), key)
+        if self.dimensions == 1:
+            root.values[self.prefix + (i,)] = value
+            root.stored[self.prefix + (i,)] = True
+            root.seen[self.prefix + (i,)] = True
+        else:
+            child = self.view(i, key)
+            if isinstance(value, DenseStorage) and value.root is root and value.prefix == child.prefix:
+                return
+            items = dict(value.items()) if isinstance(value, Storage) else dict(value)
+            del self[key]
+            child.update(items)
+
+    def __getitem__(self, key):
+        child = self.children.get(key, None)
+        if child is not None:
+            return child
+        root = self.root
+        prefix = self.prefix
+        d = len(prefix)
+        i = root.index[d].get(key, None)
+        if i is None:
+            i = self.locate(d, key)
+        if d < root.dimensions - 1:
+            return self.view(i, key)
+        idx = prefix + (i,)
+        if root.stored.item(idx):
+            return root.values.item(idx)
+        v = self.default_value()
+        # non-persistant storage does not keep the access-initialized variable
+        if self.persist:
+            root.values[idx] = v
+            root.stored[idx] = True
+            root.seen[idx] = True
+        else:
+            self.purge(key)
+        return v
+
+    def __delitem__(self, key):
+        root = self.root
+        i = root.index[len(self.prefix)].get(key, None)
+        if i is None:
+            return
+        if self.dimensions == 1:
+            root.stored[self.prefix + (i,)] = False
+        else:
+            prefix = self.prefix + (i,)
+            block = prefix + self.block[len(prefix):]
+            root.stored[block] = False
+            root.seen[block] = False
+            for d in range(len(prefix) - 1, root.dimensions - 1):
+                root.nodes[d][block[:d + 1]] = False
+            self.children.pop(key, None)
+
+    def __iter__(self):
+        root = self.root
+        labels = root.labels[len(self.prefix)]
+        if self.dimensions == 1:
+            for i in np.flatnonzero(root.stored[self.block]):
+                yield labels[i]
+            for i in np.flatnonzero(self.missing):
+                yield labels[i]
+        else:
+            for i in np.flatnonzero(self.present()):
+                yield labels[i]
+
+    def __len__(self):
+        root = self.root
+        if self.dimensions == 1:
+            return int(root.stored[self.block].sum())
+        return int(self.present().sum())
+
+    def __repr__(self):
+        return dict.__repr__(self.to_dict())
+
+    def to_dict(self):
+        if self.dimensions == 1:
+            root = self.root
+            labels = root.labels[-1]
+            values = root.values[self.block]
+            return {labels[i]:values[i].item() for i in np.flatnonzero(root.stored[self.block])}
+        return {k:self[k].to_dict() for k in self}
+
+    def clear(self):
+        root = self.root
+        if self.dimensions == 1:
+            # same as popping all the items, i.e. the leaf keys are not missing anymore
+            root.seen[self.block] |= root.leaf[:len(root.labels[-1])]
+            root.stored[self.block] = False
+        else:
+            for k in list(self):
+                del self[k]
+
+    def filled(self):
+        # values of the covered cells where the missing leaf keys take the default value
+        root = self.root
+        block = self.block
+        values = root.values[block]
+        if not root.leaf_keys:
+            return values, root.stored[block].copy()
+        missing = self.missing
+        if missing.any():
+            values = values.copy()
+            values[missing] = self.defaults(int(missing.sum()))
+        return values, root.stored[block] | missing
+
+    def detach(self, values, stored):
+        # a new root storage with the same keys as this (sub-)storage
+        s = object.__new__(type(self.root))
+        s.args = self.args
+        s.kwargs = self.kwargs
+        s.parent = None
+        s.key = None
+        s.root = s
+        s.prefix = tuple()
+        s.dimensions = self.dimensions
+        s.persist = self.persist
+        s.dtype = values.dtype
+        s.default = self.default
+        s.default_range = self.default_range
+        s.leaf_keys = self.leaf_keys
+        d = len(self.prefix)
+        s.labels = [list(l) for l in self.root.labels[d:]]
+        s.index = [dict(i) for i in self.root.index[d:]]
+        s.values = values
+        s.stored = stored
+        s.seen = stored.copy()
+        s.leaf = self.root.leaf[:len(self.root.labels[-1])].copy()
+        block = self.block
+        s.nodes = [self.root.nodes[d + k][block[:d + k + 1]].copy() for k in range(self.dimensions - 1)]
+        s.children = dict()
+        return s
+
+    def operate(self, other, operation, reflected=False):
+        values, stored = self.compute(other, operation, reflected)
+        return self.detach(values, stored.copy())
+
+    def compute(self, other, operation, reflected=False):
+        # values and stored cells of the (out-of-place) result
+        values, stored = self.filled()
+        if isinstance(other, DenseStorage) and \
+            other.root.labels[len(other.prefix):] == self.root.labels[len(self.prefix):]:
+            other_values, other_stored = other.filled()
+            other_values = np.where(other_stored, other_values, other.defaults(other_values.shape))
+            mask = stored
+        elif isinstance(other, collections.Mapping):
+            other_values, has = self.align(other)
+            mask = stored & has
+            stored = self.root.stored[self.block] | mask
+        else:
+            other_values = other
+            mask = stored
+        # the cells out of the mask are not used
+        with np.errstate(all='ignore'):
+            if reflected:
+                values = np.where(mask, operation(other_values, values), values)
+            else:
+                values = np.where(mask, operation(values, other_values), values)
+        return values, stored
+
+    def ioperate(self, other, operation):
+        # in place, i.e. no new storage is built
+        values, stored = self.compute(other, operation)
+        root = self.root
+        block = self.block
+        root.values[block] = values
+        root.stored[block] = stored
+        root.seen[block] |= stored
+        return self
+
+    def align(self, other):
+        # values of a mapping aligned with the covered cells 
+        root = self.root
+        labels = root.labels[len(self.prefix)]
+        other_values = np.zeros(root.values[self.block].shape, dtype=self.dtype)
+        has = np.zeros(other_values.shape, dtype=bool)
+        if self.dimensions == 1:
+            for i in np.flatnonzero(root.stored[self.block] | self.missing):
+                try:
+                    other_values[i] = other[labels[i]]
+                    has[i] = True
+                except KeyError:
+                    pass
+        else:
+            for i in np.flatnonzero(self.present()):
+                try:
+                    other_values[i], has[i] = self.view(i, labels[i]).align(other[labels[i]])
+                except KeyError:
+                    pass
+        return other_values, has
+
+    def defaults(self, shape):
+        if self.default_range:
+            return np.random.uniform(min(self.default), max(self.default), shape)
+        return np.random.choice(self.default, shape)
+
+    def present(self):
+        # mask of the existing children
+        root = self.root
+        d = len(self.prefix)
+        return root.nodes[d][self.block[:d + 1]]
+
+    def sum(self):
+        root = self.root
+        if not root.leaf_keys:
+            block = self.block
+            return root.values[block][root.stored[block]].sum().item()
+        values, stored = self.filled()
+        return values[stored].sum().item()
+
+    def max(self):
+        root = self.root
+        stored = root.stored[self.block]
+        max_v = root.values[self.block][stored].max().item() if stored.any() else -math.inf
+        if self.missing.any() or (self.dimensions == 1 and not stored.any()):
+            max_v = max(max_v, max(self.default))
+        return max_v
+
+    def min(self):
+        root = self.root
+        stored = root.stored[self.block]
+        min_v = root.values[self.block][stored].min().item() if stored.any() else math.inf
+        if self.missing.any() or (self.dimensions == 1 and not stored.any()):
+            min_v = min(min_v, min(self.default))
+        return min_v
+
+    def argmax(self):
+        if self.dimensions == 1:
+            return self.arg(np.argmax, lambda v, d: v < max(d), -math.inf)
+
+    def argmin(self):
+        if self.dimensions == 1:
+            return self.arg(np.argmin, lambda v, d: v > min(d), math.inf)
+
+    def arg(self, func, worse, fill):
+        root = self.root
+        stored = root.stored[self.block]
+        missing = self.missing
+        if stored.any():
+            i = func(np.where(stored, root.values[self.block], fill))
+            if not missing.any() or not worse(root.values[self.block][i], self.default):
+                return root.labels[-1][i]
+        elif not missing.any():
+            return None
+        return random.sample(self.missing_keys, 1)[0]
+
+    def purge(self, child_key):
+        del self[child_key]
+        if not len(self) and self.parent is not None:
+            self.parent.purge(self.key)
+
+
+def delegate(name):
+    # an attribute of the root storage
+    return property(lambda self: getattr(self.root, name), lambda self, value: setattr(self.root, name, value))
+
+class DenseView(DenseStorage):
+    # a (sub-)storage of a DenseStorage: the configuration and the arrays are the ones of the root
+    __slots__ = ('root', 'prefix', 'parent', 'key', 'children')
+
+    args = delegate('args')
+    kwargs = delegate('kwargs')
+    persist = delegate('persist')
+    dtype = delegate('dtype')
+    default = delegate('default')
+    default_range = delegate('default_range')
+    leaf_keys = delegate('leaf_keys')
+
+    @property
+    def dimensions(self):
+        return self.root.dimensions - len(self.prefix)
+
+
+class FlatStorage(Storage):
+
+    """
+    A Storage backed by one flat table of plain rows keyed by the (s, a, ...) prefix tuples. 
+    It keeps the Storage indexing and API, but storage[s][a] is a view 
+    (FlatView) on the table instead of a separate Storage object. The views of the
+    stored prefixes are cached.
+    dimensions -- storage dimensions (default 2)
+    default -- list of initial values (default [None])
+    Note: a tuple of length at least 2 will be considered as a range
+    leaf_keys -- list of leaf keys (default None)
+    persist -- persist the access-initialized variable (default True)
+    data -- set any initial data (default None)
+    Note: the results of the operations are detached (plain) Storage objects.
+    
+    """
+
+    extremum = None
+
+    def __init__(self, dimensions=2, data=None, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+        # internal parameters
+        self.parent = None
+        self.key = None
+        self.root = self
+        self.prefix = tuple()
+        self.default_range = False
+
+        self.dimensions = dimensions
+        self.table = dict() # prefix of a leaf row -> row
+        self.children = dict() # prefix of an inner level -> ordered keys of the next dimension
+        self.consumed = dict() # prefix of a leaf row -> leaf keys which are not missing anymore
+        self.views = dict() # stored prefix -> FlatView
+        self.persist = self.kwargs.get('persist', True)
+        self.indexed = False
+
+        self.set_default(self.kwargs.get('default', [None]))
+        self.set_leaf_keys(self.kwargs.get('leaf_keys', None))
+
+        if data:
+            self.update(data)
+
+    def set_leaf_keys(self, keys):
+        self.root.leaf_keys = keys
+
+    def set_default(self, default):
+        Storage.set_default(self.root, default)
+
+    @property
+    def missing_keys(self):
+        leaf_keys = self.root.leaf_keys
+        if not leaf_keys:
+            return set()
+        if self.dimensions != 1:
+            return set(leaf_keys)
+        # the keys stored before the leaf keys were set are not missing either
+        missing = set(leaf_keys).difference(self.root.consumed.get(self.prefix, ()))
+        return missing.difference(self.root.table.get(self.prefix, ()))
+
+    @property
+    def storage(self):
+        if self.dimensions == 1:
+            return self.root.table.get(self.prefix, dict())
+        keys = self.root.children.get(self.prefix, ())
+        return {k:self[k] for k in keys}
+
+    def link(self, prefix):
+        # register the prefix at all the inner levels (from the deepest)
+        children = self.root.children
+        for i in range(len(prefix) - 1, -1, -1):
+            keys = children.get(prefix[:i], None)
+            if keys is None:
+                keys = children[prefix[:i]] = dict()
+            elif prefix[i] in keys:
+                break
+            keys[prefix[i]] = None
+
+    def row(self):
+        root = self.root
+        try:
+            return root.table[self.prefix]
+        except KeyError:
+            self.link(self.prefix)
+            row = root.table[self.prefix] = dict()
+            return row
+
+    def store(self, key, value):
+        self.row()[key] = value
+        if self.root.leaf_keys:
+            self.root.consumed.setdefault(self.prefix, set()).add(key)
+
+    def __setitem__(self, key, value):
+        if self.dimensions == 1:
+            self.store(key, value)
+        else:
+            child = self[key]
+            if isinstance(value, FlatStorage) and value.root is self.root and value.prefix == child.prefix:
+                return
+            items = dict(value.items())
+            del self[key]
+            if self.persist:
+                self.link(child.prefix)
+            child.update(items)
+
+    def __getitem__(self, key):
+        root = self.root
+        if self.dimensions > 1:
+            prefix = self.prefix + (key,)
+            try:
+                return root.views[prefix]
+            except KeyError:
+                view = FlatView(root, prefix, self.dimensions - 1)
+                if root.persist:
+                    self.link(prefix)
+                    root.views[prefix] = view
+                return view
+        try:
+            return root.table[self.prefix][key]
+        except KeyError:
+            v = self.default_value()
+            # non-persistant storage does not keep the access-initialized variable
+            if self.persist:
+                self.store(key, v)
+            return v
+
+    def __delitem__(self, key):
+        root = self.root
+        if self.dimensions == 1:
+            root.table.get(self.prefix, dict()).pop(key, None)
+            return
+        keys = root.children.get(self.prefix, None)
+        if keys is None or key not in keys:
+            return
+        del keys[key]
+        # remove the whole branch
+        branch = [self.prefix + (key,)]
+        while branch:
+            prefix = branch.pop()
+            root.views.pop(prefix, None)
+            if len(prefix) + 1 == root.dimensions:
+                root.table.pop(prefix, None)
+                root.consumed.pop(prefix, None)
+            else:
+                branch.extend(prefix + (k,) for k in root.children.pop(prefix, ()))
+
+    def __iter__(self):
+        root = self.root
+        if self.dimensions == 1:
+            for key in list(root.table.get(self.prefix, ())):
+                yield key
+            for key in self.missing_keys:
+                yield key
+        else:
+            for key in list(root.children.get(self.prefix, ())):
+                yield key
+
+    def __len__(self):
+        if self.dimensions == 1:
+            return len(self.root.table.get(self.prefix, ()))
+        return len(self.root.children.get(self.prefix, ()))
+
+    def assign(self, keys, values):
+        row = self.row()
+        row.update(zip(keys, values))
+        if self.root.leaf_keys:
+            self.root.consumed.setdefault(self.prefix, set()).update(keys)
+
+    def purge(self, child_key):
+        del self[child_key]
+
+
+class FlatView(FlatStorage):
+
+    """ 
+    A view on the table of a FlatStorage at a certain prefix.
+    
+    """
+
+    def __init__(self, root, prefix, dimensions):
+        self.root = root
+        self.prefix = prefix
+        self.dimensions = dimensions
+
+    @property
+    def parent(self):
+        if len(self.prefix) == 1:
+            return self.root
+        return FlatView(self.root, self.prefix[:-1], self.dimensions + 1)
+
+    @property
+    def key(self):
+        return self.prefix[-1]
+
+    @property
+    def args(self):
+        return self.root.args
+
+    @property
+    def kwargs(self):
+        return self.root.kwargs
+
+    @property
+    def default(self):
+        return self.root.default
+
+    @property
+    def default_range(self):
+        return self.root.default_range
+
+    @property
+    def leaf_keys(self):
+        return self.root.leaf_keys
+
+    @property
+    def persist(self):
+        return self.root.persist
+
+    @property
+    def indexed(self):
+        return self.root.indexed
@@ -4,8 +4,9 @@ import numpy as np
 import grl
 import copy
 import enum
+import contextlib
 
-__all__ = ['History', 'Index', 'HistoryManager', 'StateManager', 'PerceptManager', 'ActionManager', 'RewardManager']
+__all__ = ['History', 'Overlay', 'Index', 'HistoryManager', 'StateCache', 'Statistics', 'Interner', 'StateManager', 'PerceptManager', 'ActionManager', 'RewardManager']
 
 class Index(enum.Enum):
     NEXT = enum.auto()
@@ -16,87 +17,564 @@ class Index(enum.Enum):
     FIRST = enum.auto()
     ABSOLUTE = enum.auto()
 
-class History(collections.MutableSequence):
+class Interner:
+    """ 
+    A registry of dense integer ids of the (hashable) symbols. The ids are never reused.
+    
+    symbols -- initial symbols (default [])
+    
+    """
+    __slots__ = ('ids', 'symbols')
+
+    def __init__(self, symbols=list()):
+        self.ids = dict() # id of each symbol
+        self.symbols = list() # symbol of each id
+        for symbol in symbols:
+            self.intern(symbol)
+
+    def intern(self, symbol):
+        i = self.ids.get(symbol, None)
+        if i is None:
+            i = self.ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return i
+
+    def symbol(self, i):
+        return self.symbols[i]
+
+    def encode(self, symbols):
+        return [self.intern(symbol) for symbol in symbols]
+
+    def decode(self, ids):
+        return [self.symbols[i] for i in ids]
+
+    def __contains__(self, symbol):
+        return symbol in self.ids
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __iter__(self):
+        return iter(self.symbols)
+
+    def __repr__(self):
+        return 'Interner({})'.format(self.symbols)
 
+class History(collections.MutableSequence):
+    """ 
+    A history of the interaction stored in a preallocated buffer. 
+    The history and its (temporary) extension are two adjacent regions of the buffer.
+    
+    history -- initial history (default [])
+    maxlen -- maximum length of the history (default None)
+    steplen -- length of a step (default 1)
+    capacity -- initial capacity of the buffer (default 16)
+    codes -- store the symbols as small integer codes: True or a (shared) Interner (default False)
+    stats -- statistics of the history (default {})
+    
+    """
     def __init__(self, *args, **kwargs):
-        self.history = collections.deque(kwargs.get('history', list()), kwargs.get('maxlen', None)) # dynamic queue (default length: None:maxlen)
-        self.extension = list() # temporary extension of the history
+        self.maxlen = kwargs.get('maxlen', None)
+        codes = kwargs.get('codes', False)
+        self.codes = isinstance(codes, Interner) or bool(codes)
+        self.registry = codes if isinstance(codes, Interner) else Interner()
+        self.buffer = np.empty(max(kwargs.get('capacity', 16), 1), dtype=np.int32 if self.codes else object)
+        self.start = 0 # first item of the history in the buffer
+        self.size = 0 # length of the history
+        self.xsize = 0 # length of the extension
         self.steps = 0.0 # (fractional) steps of history
         self.xsteps = 0.0 # (fractional) steps of extended history
         self.steplen = kwargs.get('steplen', 1) # length of a step (default: 1:steplen)
         self.stats = kwargs.get('stats', dict())
+        for item in kwargs.get('history', list()):
+            self.append(item)
 
     # return the current history time step
     @property
     def t(self):
         return self.steps + self.xsteps
 
-    # TODO: no slicing at the moment
+    # the history and the extension regions of the buffer
+    @property
+    def history(self):
+        return Region(self, False)
+
+    @property
+    def extension(self):
+        return Region(self, True)
+
+    def encode(self, item):
+        return self.registry.intern(item) if self.codes else item
+
+    def decode(self, code):
+        return self.registry.symbols[code] if self.codes else code
+
+    def reserve(self, n=1):
+        # make room for n more items after the extension
+        end = self.start + self.size + self.xsize
+        if end + n <= len(self.buffer):
+            return
+        length = self.size + self.xsize
+        if 2 * (length + n) > len(self.buffer):
+            buffer = np.empty(2 * (length + n), dtype=self.buffer.dtype)
+        else:
+            # compact the live items to the front of the buffer
+            buffer = self.buffer
+        buffer[:length] = self.buffer[self.start:end]
+        if buffer is self.buffer and not self.codes:
+            buffer[length:end] = None
+        self.buffer = buffer
+        self.start = 0
+
+    def locate(self, index):
+        length = self.size + self.xsize
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("History index out of range.")
+        return self.start + index
+
+    # slices are read-only views (valid until the history is modified)
     def __getitem__(self, index):
-        storage, index = self.__adjust_index__(index)
-        return storage[index]
+        if type(index) is int and index < 0:
+            # the reads of the tail (e.g. h[-1]) skip locate and decode
+            i = self.start + self.size + self.xsize + index
+            if i < self.start:
+                raise IndexError("History index out of range.")
+            return self.registry.symbols[self.buffer[i]] if self.codes else self.buffer[i]
+        if isinstance(index, slice):
+            return self.view()[index]
+        return self.decode(self.buffer[self.locate(index)])
+
+    def view(self, start=0, length=None):
+        if length is None: 
+            length = self.size + self.xsize - start
+        array = self.buffer[self.start + start:self.start + start + length]
+        array.flags.writeable = False
+        return View(self, array)
+
+    # the last k steps of the (extended) history
+    def window(self, k_steps):
+        n = k_steps * self.steplen
+        if not float(n).is_integer():
+            raise RuntimeError("unable to window {} elements.".format(n))
+        length = self.size + self.xsize
+        n = min(int(n), length)
+        return self.view(length - n, n)
 
     # iterate over the history first then extension
     def __iter__(self):
-        for v in self.history:
-            yield v
-        for v in self.extension:
-            yield v
+        for v in self.buffer[self.start:self.start + self.size + self.xsize]:
+            yield self.decode(v)
 
     def insert(self, index, value):
         # TODO: a patchy implementation
-        self.history.append(value)
-    
+        self.append(value)
+
+    def append(self, value):
+        buffer, start, size = self.buffer, self.start, self.size
+        if self.maxlen is not None and size >= self.maxlen:
+            if not self.maxlen:
+                return
+            # drop the oldest item of the history (its reference is cleared by the next compaction)
+            start = self.start = start + 1
+            size -= 1
+        i = start + size
+        if i + self.xsize >= len(buffer):
+            self.size = size
+            self.reserve(1)
+            buffer, i = self.buffer, self.start + size
+        if self.xsize:
+            # shift the extension to make room for the item
+            buffer[i + 1:i + 1 + self.xsize] = buffer[i:i + self.xsize]
+        buffer[i] = self.registry.intern(value) if self.codes else value
+        self.size = size + 1
+
+    def xappend(self, value):
+        self.reserve(1)
+        self.buffer[self.start + self.size + self.xsize] = self.encode(value)
+        self.xsize += 1
+
+    def pop(self, index=-1):
+        i = self.locate(index)
+        value = self.decode(self.buffer[i])
+        del self[index]
+        return value
+
+    def xpop(self):
+        if not self.xsize:
+            raise IndexError("pop from an empty extension")
+        return self.pop()
+
     def __delitem__(self, index):
-        storage, index = self.__adjust_index__(index)
-        del storage[index]
+        i = self.locate(index)
+        end = self.start + self.size + self.xsize
+        self.buffer[i:end - 1] = self.buffer[i + 1:end]
+        if not self.codes:
+            self.buffer[end - 1] = None
+        if i < self.start + self.size:
+            self.size -= 1
+        else:
+            self.xsize -= 1
 
     def __setitem__(self, index, value):
-        storage, index = self.__adjust_index__(index)
-        storage[index] = value
+        self.buffer[self.locate(index)] = self.encode(value)
         
     def __len__(self):
-        return len(self.history) + len(self.extension)
+        return self.size + self.xsize
 
     def __repr__(self):
         return repr(self.history) + ' | ' + repr(self.extension) + ' <steps={},xsteps={},steplen={}>'.format(self.steps, self.xsteps, self.steplen)
 
-    def __adjust_index__(self, index):
-        if index < 0:
-            if -index < len(self.extension) + 1:
-                return self.extension, index
-            else:
-                return self.history, index + len(self.extension)
-        else:
-            if index > len(self.history) - 1:
-                return self.extension, index - len(self.history)
-            else:
-                return self.history, index
-
     def extract(self, order, index=Index.CURRENT):
         # TODO: only CURRENT and PREVIOUS extractions are supported    
         assert(order > 0 and order <= self.steplen)
         order = order % self.steplen
-        head = int((self.t % 1) * self.steplen)
+        head = int(((self.steps + self.xsteps) % 1) * self.steplen)
         idx = order - head - 1
         if order > head: idx -= self.steplen
         if index == Index.PREVIOUS: idx -= self.steplen
         return self[idx]
 
+class Region(collections.Sequence):
+    """ 
+    A live region (the history or the extension) of a History.
+    
+    """
+    __slots__ = ('h', 'extension')
+
+    def __init__(self, h, extension):
+        self.h = h
+        self.extension = extension
+
+    @property
+    def offset(self):
+        return self.h.start + (self.h.size if self.extension else 0)
+
+    def __len__(self):
+        return self.h.xsize if self.extension else self.h.size
+
+    def __getitem__(self, index):
+        length = len(self)
+        if isinstance(index, slice):
+            return self.h.view(self.offset - self.h.start, length)[index]
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("History index out of range.")
+        return self.h.decode(self.h.buffer[self.offset + index])
+
+    def __iter__(self):
+        for v in self.h.buffer[self.offset:self.offset + len(self)]:
+            yield self.h.decode(v)
+
+    def append(self, value):
+        if self.extension:
+            self.h.xappend(value)
+        else:
+            self.h.append(value)
+
+    def pop(self):
+        if not len(self):
+            raise IndexError("pop from an empty region")
+        return self.h.pop(len(self) - 1 if not self.extension else -1)
+
+    def __repr__(self):
+        return repr(list(self))
+
+class View(collections.Sequence):
+    """ 
+    A read-only view over the buffer of a History (no copying).
+    
+    """
+    __slots__ = ('h', 'array')
+
+    def __init__(self, h, array):
+        self.h = h
+        self.array = array
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return View(self.h, self.array[index])
+        return self.h.decode(self.array[index])
+
+    def __iter__(self):
+        for v in self.array:
+            yield self.h.decode(v)
+
+    def __eq__(self, other):
+        if not isinstance(other, collections.Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(x == y for x, y in zip(self, other))
+
+    def __repr__(self):
+        return repr(list(self))
+
+class Overlay(collections.Sequence):
+    """ 
+    A read-only view of a history with a hypothetical extension (Index.NEXT) or 
+    without its last step (Index.PREVIOUS). The underlying history is not touched 
+    and no events are dispatched, i.e. the statistics are the ones of the history.
+    
+    """
+    __slots__ = ('base', 'length', 'extra', 'steps', 'xsteps')
+
+    def __init__(self, h, index=Index.CURRENT, extension=list(), steps=1.0):
+        self.base = h
+        self.length = len(h)
+        self.extra = list()
+        self.steps = h.steps
+        self.xsteps = h.xsteps
+        if index == Index.NEXT:
+            self.extra = list(extension)
+            self.xsteps += len(self.extra) / h.steplen
+        elif index == Index.PREVIOUS:
+            self.length = max(self.length - int(steps * h.steplen), 0)
+            if h.xsteps:
+                self.xsteps -= steps
+            else:
+                self.steps -= steps
+
+    @property
+    def t(self):
+        return self.steps + self.xsteps
+
+    @property
+    def steplen(self):
+        return self.base.steplen
+
+    @property
+    def stats(self):
+        return self.base.stats
+
+    def __len__(self):
+        return self.length + len(self.extra)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1 and stop <= self.length:
+                return self.base[start:stop]
+            return [self[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("History index out of range.")
+        return self.base[index] if index < self.length else self.extra[index - self.length]
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self.base[i]
+        for v in self.extra:
+            yield v
+
+    def window(self, k_steps):
+        n = k_steps * self.steplen
+        if not float(n).is_integer():
+            raise RuntimeError("unable to window {} elements.".format(n))
+        return self[max(len(self) - int(n), 0):]
+
+    extract = History.extract
+
+    def __repr__(self):
+        return repr(list(self)) + ' <steps={},xsteps={},steplen={}>'.format(self.steps, self.xsteps, self.steplen)
+
+class StateCache:
+    """ 
+    A least-recently-used cache of the states of a history. 
+    It is cleared on the ADD/REMOVE events of the history.
+    
+    size -- maximum number of cached states (default 128)
+    
+    """
+    def __init__(self, size=128):
+        self.size = size
+        self.states = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, h, args, kwargs):
+        # None if the arguments are not hashable
+        items = tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in sorted(kwargs.items()))
+        key = (len(h), h.t, args, items)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key, default=None):
+        if key not in self.states:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.states.move_to_end(key)
+        return self.states[key]
+
+    def put(self, key, s):
+        self.states[key] = s
+        self.states.move_to_end(key)
+        while len(self.states) > self.size:
+            self.states.popitem(last=False)
+
+    def clear(self):
+        self.states.clear()
+
+    def on(self, event):
+        self.states.clear()
+
+class Statistics(dict):
+    """ 
+    Streaming (exact) counts of the symbols of a history: per symbol, per position within the step 
+    and per complete step, e.g. the (action, percept) pairs. It is a dict, so the processors 
+    (e.g. occurrence_ratio_processor) may keep their own entries.
+    The complete steps start at the offset (e.g. at the actions), i.e. in a domain-initiated history
+    the first percept is not a part of any step. In a sliding window, only the steps within the window are counted.
+    
+    steplen -- length of a step (default 1)
+    decay -- decay factor (per step) of the decayed counts, None for no decayed counts (default None)
+    offset -- position of the first item of the steps (default: inferred from the first update, e.g. 1 after [e])
+    
+    """
+    def __init__(self, steplen=1, decay=None, offset=None):
+        super().__init__()
+        self.steplen = steplen
+        self.decay = decay
+        self.offset = offset
+        self.evicted = 0 # (absolute) index of the oldest item in the window
+        self.counts = collections.Counter()
+        self.positions = collections.Counter()
+        self.steps = collections.Counter()
+        self.items = 0
+        # the decayed counts are kept relative to the origin (step)
+        self.decayed = collections.Counter()
+        self.decayed_items = 0.0
+        self.origin = 0
+        self.now = 0
+
+    def add(self, item, index, step=None, sign=1):
+        self.counts[item] += sign
+        self.positions[(index % self.steplen, item)] += sign
+        self.items += sign
+        if step is not None:
+            self.steps[step] += sign
+        if self.decay:
+            t = index // self.steplen
+            self.now = max(self.now, t)
+            if self.decay ** (self.now - self.origin) < 1e-150:
+                self.rebase()
+            w = sign * self.decay ** (self.origin - t)
+            self.decayed[item] += w
+            self.decayed_items += w
+
+    def rebase(self):
+        factor = self.decay ** (self.now - self.origin)
+        for item in self.decayed:
+            self.decayed[item] *= factor
+        self.decayed_items *= factor
+        self.origin = self.now
+
+    def update(self, h, update, sign=1):
+        # the update starts at the end of h
+        start = int(round(h.t * self.steplen))
+        if self.offset is None:
+            self.offset = (start + len(update)) % self.steplen
+        # the items of the (incomplete) step before the update
+        k = min((start - self.offset) % self.steplen, len(h))
+        items = (list(h[len(h) - k:]) if k else list()) + list(update)
+        for i, item in enumerate(update):
+            index = start + i
+            step = None
+            # a complete step (within the window)
+            first = index - self.steplen + 1
+            if (first - self.offset) % self.steplen == 0 and first >= max(self.evicted, start - k):
+                step = tuple(items[i + k + 1 - self.steplen:i + k + 1])
+            self.add(item, index, step, sign)
+
+    def evict(self, h, n):
+        # the n oldest items of the history (before they are overwritten)
+        end = int(round(h.steps * self.steplen))
+        start = end - h.size
+        offset = self.offset if self.offset is not None else 0
+        window = list(h.history[:n + self.steplen - 1])
+        for j, item in enumerate(window[:n]):
+            index = start + j
+            step = None
+            # the step starting at the item was counted iff it is complete
+            if (index - offset) % self.steplen == 0 and index >= self.evicted and index + self.steplen <= end:
+                step = tuple(window[j:j + self.steplen])
+            self.add(item, index, step, -1)
+        self.evicted = max(self.evicted, start + n)
+
+    def on(self, event):
+        self.update(event.data['h'], event.data['update'], 1 if event.type == grl.EventType.ADD else -1)
+
+    def count(self, symbol, position=None):
+        return self.counts[symbol] if position is None else self.positions[(position % self.steplen, symbol)]
+
+    def decayed_count(self, symbol):
+        return self.decayed[symbol] * self.decay ** (self.now - self.origin) if self.decay else self.counts[symbol]
+
+    # occurrences per step
+    def ratio(self, symbol, position=None, decayed=False):
+        if decayed:
+            steps = self.decayed_items * self.decay ** (self.now - self.origin) / self.steplen if self.decay else 0.0
+            return self.decayed_count(symbol) / steps if steps else 0.0
+        steps = self.items / self.steplen
+        return self.count(symbol, position) / steps if steps else 0.0
+
+# the default functions of the managers (module-level, i.e. picklable)
+def unknown_state(*args, **kwargs): return '<?>'
+
+def identity_emission(s): return s
+
+def same_transition(s, a): return s
+
+def zero_reward(h, *args, **kwargs): return 0
+
 class HistoryManager:
 
-    def __init__(self, state_map=lambda *x, **y: '<?>', history=[], *args, **kwargs):
+    def __init__(self, state_map=None, history=[], *args, **kwargs):
         self.steplen = kwargs.get('steplen', 2)
         self.maxlen = None if not kwargs.get('maxlen', None) else self.steplen * kwargs.get('maxlen', None)
-        self.history = History(history=history, maxlen=self.maxlen, steplen=self.steplen)
+        self.history = History(history=history, maxlen=self.maxlen, steplen=self.steplen, codes=kwargs.get('codes', False))
         self.history.steps = kwargs.get('steps', 0.0)
-        self.state_map = state_map
-        self.listeners = collections.defaultdict(set)
+        self.state_map = state_map if state_map is not None else unknown_state
+        # evaluate the non-current states on read-only overlays (default: True)
+        self.overlay = kwargs.get('overlay', True)
+        # subscriptions (listener, symbols, positions) of each event type
+        self.listeners = collections.defaultdict(list)
+        self.pool = list() # reusable events
+        self.batching = 0 # depth of the batched notifications
+        self.pending = list() # batched (recorded) items
+        self.states = Interner() # dense ids of the (abstract) states
+        # streaming statistics of the history in h.stats (default: False:statistics)
+        self.statistics = None
+        if kwargs.get('statistics', False):
+            self.statistics = self.history.stats = Statistics(self.steplen, kwargs.get('decay', None))
+            self.register(self.statistics)
+        # memoize the states of the own history (default: 0:cache_size, i.e. no cache)
+        self.cache = None
+        if kwargs.get('cache_size', 0):
+            self.cache = StateCache(kwargs['cache_size'])
+            self.register(self.cache, grl.EventType.ADD)
+            self.register(self.cache, grl.EventType.REMOVE)
 
     def record(self, items, notify=True):
         steps = len(items) / self.steplen
+        if self.statistics is not None and self.maxlen is not None:
+            # the items pushed out of the window
+            overflow = self.history.size + len(items) - self.maxlen
+            if overflow > 0:
+                self.statistics.evict(self.history, min(overflow, self.history.size))
         if steps and notify: 
-            self.dispatch(grl.EventType.ADD, {'h':self.history, 'update':items})
+            if self.batching and not self.history.xsize:
+                self.pending.extend(items)
+            else:
+                self.notify(grl.EventType.ADD, items)
         for item in items:
             self.history.append(item)
         self.history.steps += steps
@@ -104,15 +582,19 @@ class HistoryManager:
         return self
 
     def extend(self, items, notify=True):
+        if self.pending: 
+            self.flush()
         steps = len(items) / self.steplen
         if steps and notify:
-            self.dispatch(grl.EventType.ADD, {'h':self.history, 'update':items})
+            self.notify(grl.EventType.ADD, items, extension=True)
         for item in items:
-            self.history.extension.append(item)
+            self.history.xappend(item)
         self.history.xsteps += steps
         return self
 
     def drop(self, steps=1.0, notify=True):
+        if self.pending: 
+            self.flush()
         if not (float(steps) * self.steplen).is_integer():
             raise RuntimeError("unable to drop {} elements.".format(steps * self.steplen))
         dropped = list()
@@ -120,27 +602,42 @@ class HistoryManager:
             dropped.append(self.history.pop())
         self.history.steps -= steps
         if dropped and notify:
-            self.dispatch(grl.EventType.REMOVE, {'h':self.history, 'update':dropped[::-1]})
+            self.notify(grl.EventType.REMOVE, dropped[::-1])
         return dropped[::-1]
 
     def xdrop(self, steps=None, notify=True):
+        if self.pending: 
+            self.flush()
         if steps is None: steps = self.history.xsteps
         dropped = list()
         if not (float(steps) * self.steplen).is_integer():
             raise RuntimeError("unable to drop {} elements.".format(steps * self.steplen))
         for _ in range(int(steps*self.steplen)):
-            dropped.append(self.history.extension.pop())
+            dropped.append(self.history.xpop())
         self.history.xsteps -= steps
         if dropped and notify: 
-            self.dispatch(grl.EventType.REMOVE, {'h':self.history, 'update':dropped[::-1]})
+            self.notify(grl.EventType.REMOVE, dropped[::-1], extension=True)
         return dropped[::-1]
 
     def xmerge(self):
-        if self.history.extension:
+        if self.history.xsize:
             self.record(self.xdrop(notify=False), notify=False)
         else:
             raise ValueError("The extension is empty.")
 
+    # start a new (empty) history with the same settings
+    def clear(self):
+        history = History(maxlen=self.maxlen, steplen=self.steplen, codes=self.history.registry if self.history.codes else False)
+        if self.statistics is not None:
+            self.deregister(self.statistics)
+            self.statistics = history.stats = Statistics(self.steplen, self.statistics.decay)
+            self.register(self.statistics)
+        if self.cache is not None:
+            self.cache.clear()
+        self.pending = list()
+        self.history = history
+        return self
+
     @property
     def h(self):
         return self.history
@@ -152,8 +649,26 @@ class HistoryManager:
         self.history = history
 
     def state(self, history, *args, **kwargs):
+        if self.cache is None or history is not self.history:
+            return self.evaluate(history, *args, **kwargs)
+        key = self.cache.key(history, args, kwargs)
+        if key is None:
+            return self.evaluate(history, *args, **kwargs)
+        s = self.cache.get(key, self.cache)
+        if s is self.cache:
+            s = self.evaluate(history, *args, **kwargs)
+            self.cache.put(key, s)
+        return s
+
+    # dense id of the (abstract) state
+    def state_id(self, history, *args, **kwargs):
+        return self.states.intern(self.state(history, *args, **kwargs))
+
+    def evaluate(self, history, *args, **kwargs):
         index = kwargs.get('index', Index.CURRENT)
         extension = kwargs.get('extension', list())
+        if self.overlay:
+            return self.state_map(history if index == Index.CURRENT else Overlay(history, index, extension), *args, **kwargs)
         hm = self.assert_hm(history)
 
         change = hm.amend(history, index, extension)
@@ -164,20 +679,84 @@ class HistoryManager:
     def assert_hm(self, history):
         hm = self
         if history is not self.history:
-            hm = copy.deepcopy(self)
+            # a shallow manager bound to the foreign history (the state map is shared)
+            # the listeners, the statistics and the cache of the own history do not see the foreign changes
+            hm = copy.copy(self)
             hm.history = history
+            hm.listeners = collections.defaultdict(list)
+            hm.pool = list()
+            hm.batching = 0
+            hm.pending = list()
+            hm.statistics = None
+            hm.cache = None
         return hm
 
-    def register(self, obj, event_type=grl.EventType.ALL):
-        self.listeners[event_type].add(obj)
+    # optional filters: the symbols in the update and their positions within the step
+    def register(self, obj, event_type=grl.EventType.ALL, symbols=None, positions=None):
+        symbols = None if symbols is None else frozenset(symbols)
+        positions = None if positions is None else frozenset(p % self.steplen for p in positions)
+        for t in (grl.EventType.ADD, grl.EventType.REMOVE):
+            if t in event_type:
+                self.deregister(obj, t)
+                self.listeners[t].append((obj, symbols, positions))
     
     def deregister(self, obj, event_type=grl.EventType.ALL):
-        self.listeners[event_type].discard(obj)
+        for t in (grl.EventType.ADD, grl.EventType.REMOVE):
+            if t in event_type:
+                self.listeners[t] = [x for x in self.listeners[t] if x[0] is not obj]
     
     def dispatch(self, event_type, data):
-        evt = grl.Event(event_type, data)
-        for obj in self.listeners[event_type]:
-            obj.on(evt)
+        if self.pending: 
+            self.flush()
+        self.deliver(grl.Event(event_type, data))
+
+    # dispatch with a pooled event (nothing is allocated if no one listens)
+    # WARNING! The listeners should not keep the events.
+    def notify(self, event_type, update, h=None, extension=False):
+        if self.pending: 
+            self.flush()
+        if not self.listeners[event_type]:
+            return
+        evt = self.pool.pop() if self.pool else grl.Event(None, dict())
+        evt.type = event_type
+        evt.data['h'] = self.history if h is None else h
+        evt.data['update'] = update
+        evt.data['extension'] = extension # the update is (from) the extension
+        try:
+            self.deliver(evt)
+        finally:
+            evt.data['h'] = evt.data['update'] = None
+            self.pool.append(evt)
+
+    def deliver(self, evt):
+        h, update = evt.data['h'], evt.data['update']
+        for obj, symbols, positions in self.listeners[evt.type]:
+            if (symbols is None and positions is None) or self.match(h, update, symbols, positions):
+                obj.on(evt)
+
+    def match(self, h, update, symbols, positions):
+        if positions is None:
+            return any(x in symbols for x in update)
+        # position of the first item of the update
+        start = int(round(h.t * h.steplen))
+        return any((symbols is None or x in symbols) and (start + i) % h.steplen in positions for i, x in enumerate(update))
+
+    # merge the notifications of the records into one (per batch)
+    @contextlib.contextmanager
+    def batch(self):
+        self.batching += 1
+        try:
+            yield self
+        finally:
+            self.batching -= 1
+            if not self.batching:
+                self.flush()
+
+    def flush(self):
+        items, self.pending = self.pending, list()
+        if items and self.listeners[grl.EventType.ADD]:
+            # the listeners see the history as it was before the batched records
+            self.notify(grl.EventType.ADD, items, Overlay(self.history, Index.PREVIOUS, steps=len(items) / self.steplen))
 
     def amend(self, h, index=Index.CURRENT, extension=list()):
         old_h = list()
@@ -202,11 +781,22 @@ class HistoryManager:
 
 class PerceptManager:
 
-    def __init__(self, emission_func=lambda s : s, percept_space=None, e=None):
+    def __init__(self, emission_func=identity_emission, percept_space=None, e=None):
         self.emission_func = emission_func
+        self.symbols = Interner() # dense ids of the percepts
         self.percept_space = percept_space
         self.percept = e
 
+    # the percepts of the space get the first ids (in order)
+    @property
+    def percept_space(self):
+        return self.space
+
+    @percept_space.setter
+    def percept_space(self, space):
+        self.space = space
+        self.symbols.encode(space or list())
+
     def perception(self, s):
         if not callable(self.emission_func):
             raise RuntimeError("No valid percept function is provided.")      
@@ -215,12 +805,23 @@ class PerceptManager:
 
 class StateManager: 
 
-    def __init__(self, transition_func=lambda s,a: s, state_space=None, *args, **kwargs):
+    def __init__(self, transition_func=same_transition, state_space=None, *args, **kwargs):
         self.transition_func = transition_func
         self.hm = HistoryManager(maxlen=kwargs.get('max_history', 1), steplen=1)
         self.state = kwargs.get('start_state', None)
+        self.symbols = Interner() # dense ids of the states
         self.state_space = state_space
 
+    # the states of the space get the first ids (in order)
+    @property
+    def state_space(self):
+        return self.space
+
+    @state_space.setter
+    def state_space(self, space):
+        self.space = space
+        self.symbols.encode(space or list())
+
     def simulate(self, a, s=None):
         if s is None:
             s = self.state
@@ -238,19 +839,34 @@ class StateManager:
 class ActionManager:
 
     def __init__(self, action_space=None, a=None):
+        self.symbols = Interner() # dense ids of the actions
         self.action_space = action_space
         self.action = a
+
+    # the actions of the space get the first ids (in order)
+    @property
+    def action_space(self):
+        return self.space
+
+    @action_space.setter
+    def action_space(self, space):
+        self.space = space
+        self.symbols.encode(space or list())
     
 class RewardManager:
 
-    def __init__(self, reward_func=lambda h, *x, **y: 0):
+    def __init__(self, reward_func=zero_reward, overlay=True):
         self.reward_func = reward_func
         self.hm = grl.HistoryManager()
+        # evaluate the non-current rewards on read-only overlays
+        self.overlay = overlay
 
     def r(self, h, *args, **kwargs):
-        self.hm.h = h
         extension = kwargs.get('extension', list())
         index = kwargs.get('index', Index.CURRENT)
+        if self.overlay:
+            return self.reward_func(h if index == Index.CURRENT else Overlay(h, index, extension))
+        self.hm.h = h
         change = self.hm.amend(h, index, extension)
 
         reward = self.reward_func(h)
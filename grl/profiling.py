@@ -0,0 +1,110 @@
+import time
+import collections
+import grl
+
+__all__ = ['Profiler', 'profile']
+
+# the profiler attached to the new objects (see profile)
+active = None
+
+# the entry points of the objects in each phase
+PHASES = {
+    'act': ['act', 'act_many'],
+    'react': ['react', 'react_many'],
+    'learn': ['learn', 'learn_many'],
+    'oracle': ['oracle'],
+}
+
+class Profiler:
+    """
+    Cumulative timers and call counters of the hot entry points: act, react, learn and oracle of the agents and
+    the domains, state (the state map) and deliver (the event dispatch) of the history managers, and r of the
+    reward managers. The entry points are wrapped on the (attached) instances only, so the objects without a
+    profiler run as they are. The times are inclusive, e.g. the time of act includes the states it evaluates.
+
+    """
+    def __init__(self):
+        self.calls = collections.defaultdict(int)
+        self.times = collections.defaultdict(float)
+        # (id of the instance, name) -> (instance, replaced instance attribute or None, wrapper)
+        self.wrapped = dict()
+
+    def wrap(self, obj, name, phase):
+        func = getattr(obj, name, None)
+        if func is None:
+            return
+        # the entry points already timed by this profiler (e.g. the oracle of the domain given to the agent)
+        if getattr(func, 'profiler', None) is self:
+            # the copies of the wrappers are restored by detach too
+            if obj.__dict__.get(name, None) is func and self.wrapped.get((id(obj), name), (None,) * 3)[2] is not func:
+                self.wrapped[(id(obj), name)] = (obj, func.original, func)
+            return
+        calls, times, clock = self.calls, self.times, time.perf_counter
+        def timed(*args, **kwargs):
+            t0 = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                times[phase] += clock() - t0
+                calls[phase] += 1
+        timed.profiler = self
+        timed.original = func
+        self.wrapped[(id(obj), name)] = (obj, obj.__dict__.get(name, None), timed)
+        setattr(obj, name, timed)
+
+    def attach(self, *objs):
+        for obj in objs:
+            if isinstance(obj, grl.HistoryManager):
+                self.wrap(obj, 'state', 'state')
+                self.wrap(obj, 'deliver', 'dispatch')
+            elif isinstance(obj, grl.RewardManager):
+                self.wrap(obj, 'r', 'reward')
+            else:
+                for phase, names in PHASES.items():
+                    for name in names:
+                        self.wrap(obj, name, phase)
+                if isinstance(obj, grl.GRLObject):
+                    obj.profiler = self
+                    self.attach(obj.hm, obj.rm)
+        return self
+
+    def detach(self):
+        for (_, name), (obj, original, timed) in self.wrapped.items():
+            # the attributes replaced since (e.g. a new oracle of the agent) are kept
+            if obj.__dict__.get(name, None) is timed:
+                if original is None:
+                    del obj.__dict__[name]
+                else:
+                    setattr(obj, name, original)
+            if getattr(obj, 'profiler', None) is self:
+                obj.profiler = None
+        self.wrapped.clear()
+        return self
+
+    def reset(self):
+        self.calls.clear()
+        self.times.clear()
+        return self
+
+    # the breakdown: phase -> (calls, seconds, seconds per call), in decreasing time
+    def stats(self):
+        return collections.OrderedDict((phase, (self.calls[phase], t, t / self.calls[phase] if self.calls[phase] else 0.0))
+                                       for phase, t in sorted(self.times.items(), key=lambda x: -x[1]))
+
+    def __str__(self):
+        lines = ["{:<10}{:>12}{:>14}{:>14}".format('phase', 'calls', 'seconds', 'us/call')]
+        for phase, (calls, t, per_call) in self.stats().items():
+            lines.append("{:<10}{:>12}{:>14.6f}{:>14.3f}".format(phase, calls, t, 1e6 * per_call))
+        return '\n'.join(lines)
+
+def profile(profiler=True):
+    """
+    Attaches a profiler to all the objects (agents and domains) created afterwards.
+
+    profiler -- Profiler, True (a new Profiler) or None (no global profiling) (default True)
+    Returns the active profiler.
+
+    """
+    global active
+    active = Profiler() if profiler is True else profiler
+    return active
@@ -0,0 +1,308 @@
+import os
+import time
+import random
+import datetime
+import multiprocessing
+import numpy as np
+import grl
+
+__all__ = ['Simulator', 'VectorDomain', 'VectorSimulator', 'Spec', 'run_parallel']
+
+class Simulator:
+    """
+    Runs the interaction loop of an agent and a domain: act -> react -> learn -> record.
+    There is no I/O in the loop. The callbacks are called every few steps with the simulator, e.g. for the
+    progress, the checkpoints or the metrics.
+
+    agent -- Agent
+    domain -- Domain
+    history_mgr -- HistoryManager of the interaction (default: the manager of the agent)
+    order -- order of the agent in a step, i.e. 1: agent-initiated, 2: domain-initiated
+             (default: the order of the agent if it is set, otherwise 1)
+    register -- register the domain on the events of the history manager (default True)
+    callbacks -- (every, callback) pairs (default: no callbacks)
+    profiler -- Profiler of the agent, the domain and the history manager, or True for a new one (default None)
+
+    """
+    def __init__(self, agent, domain, history_mgr=None, **kwargs):
+        self.agent = agent
+        self.domain = domain
+        self.hm = history_mgr if isinstance(history_mgr, grl.HistoryManager) else agent.hm
+        self.order = kwargs.get('order', agent.order if agent.order in (1, 2) else 1)
+        self.register = kwargs.get('register', True)
+        self.callbacks = list(kwargs.get('callbacks', list()))
+        self.profiler = kwargs.get('profiler', None)
+        if self.profiler is True:
+            self.profiler = grl.Profiler()
+        self.started = False
+        self.steps = 0 # steps in the loop (excluding the start)
+        self.target = 0 # steps at the end of the current run
+        self.elapsed = 0.0 # seconds in the loop (including the callbacks)
+
+    def add(self, every, callback):
+        self.callbacks.append((int(every), callback))
+        return self
+
+    def start(self):
+        self.agent.interact(self.domain)
+        if self.profiler is not None:
+            self.profiler.attach(self.agent, self.domain, self.hm)
+        if self.register:
+            self.hm.register(self.domain, grl.EventType.ALL)
+        if self.order == 1:
+            # an agent-initiated framework
+            a = self.agent.start(order=1)
+            e = self.domain.start(a, order=2)
+            self.hm.record([a, e])
+        else:
+            # a domain-initiated framework
+            self.agent.order = 2
+            e = self.domain.start(order=1)
+            self.hm.record([e])
+        self.started = True
+        return self
+
+    def run(self, steps):
+        if not self.started:
+            self.start()
+        self.target = self.steps + steps
+        t0 = time.perf_counter()
+        while self.steps < self.target:
+            # run until the next callback
+            n = min([every - self.steps % every for every, _ in self.callbacks if every > 0] + [self.target - self.steps])
+            self.loop(n)
+            self.steps += n
+            t1 = time.perf_counter()
+            self.elapsed += t1 - t0
+            t0 = t1
+            for every, callback in self.callbacks:
+                if every > 0 and self.steps % every == 0:
+                    callback(self)
+        self.elapsed += time.perf_counter() - t0
+        return self
+
+    def loop(self, n):
+        act, react, learn, record = self.agent.act, self.domain.react, self.agent.learn, self.hm.record
+        h = self.hm.h
+        for _ in range(n):
+            a = act(h)
+            e = react(h, a)
+            learn(h, a, e)
+            record([a, e])
+
+    @property
+    def rate(self):
+        # steps per second
+        return self.steps / self.elapsed if self.elapsed > 0.0 else 0.0
+
+    # a summary of the run (e.g. sent back by the workers of run_parallel)
+    def summary(self):
+        summary = {'steps': self.steps, 'elapsed': self.elapsed, 'rate': self.rate}
+        if self.profiler is not None:
+            summary['profile'] = self.profiler.stats()
+        return summary
+
+    # a callback printing the progress of the current run
+    def progress(self):
+        remaining = (self.target - self.steps) / self.rate if self.rate > 0.0 else 0.0
+        print("\r{:.2f}% Complete - Elapsed: {}, Remaining: {}, Steps/s: {:.0f}".format(
+              100 * self.steps / self.target if self.target else 100.0, datetime.timedelta(seconds=self.elapsed),
+              datetime.timedelta(seconds=remaining), self.rate), end='')
+
+class VectorDomain(grl.Domain):
+    """
+    N copies of a tabular domain advancing in lockstep. The states, the actions and the percepts of the copies
+    are arrays of indices (the labels are in the state, action and percept spaces), and there are no histories.
+    The Domain interface (start, react and reward_func) drives all the copies with the same action and
+    returns the percept and the reward of the first copy.
+
+    n -- number of copies (default 1)
+    P -- transition probabilities P[a, s, s']
+    R -- rewards R[a, s, s'] (default 0)
+    E -- percepts E[a, s, s'] (default: the next state)
+    E0 -- percepts at the initial states (default: the initial states)
+    initial -- distribution of the initial states (default: uniform)
+    terminal -- states after which the copies restart at an initial state (default: no states)
+    actions, states, percepts -- labels (default: the indices)
+    seed -- seed of the random number generator (default None)
+
+    """
+    def setup(self):
+        self.P = np.asarray(self.kwargs['P'], dtype=float)
+        n_actions, n_states = self.P.shape[:2]
+        self.R = np.broadcast_to(np.asarray(self.kwargs.get('R', 0.0), dtype=float), self.P.shape)
+        self.E = np.broadcast_to(np.asarray(self.kwargs.get('E', np.arange(n_states)), dtype=int), self.P.shape)
+        self.E0 = np.broadcast_to(np.asarray(self.kwargs.get('E0', np.arange(n_states)), dtype=int), (n_states,))
+        initial = np.asarray(self.kwargs.get('initial', np.full(n_states, 1 / n_states)), dtype=float)
+        self.terminal = np.zeros(n_states, dtype=bool)
+        self.terminal[self.kwargs.get('terminal', list())] = True
+        # the cumulative distributions (robust to the rounding errors)
+        self.cdf = self.P.cumsum(axis=-1)
+        self.cdf[..., -1] = 1.0
+        self.initial_cdf = initial.cumsum()
+        self.initial_cdf[-1] = 1.0
+        self.n = self.kwargs.get('n', 1)
+        self.am.action_space = list(self.kwargs.get('actions', range(n_actions)))
+        self.sm.state_space = list(self.kwargs.get('states', range(n_states)))
+        self.pm.percept_space = list(self.kwargs.get('percepts', range(max(self.E.max(), self.E0.max()) + 1)))
+        self.s = self.sample(np.broadcast_to(self.initial_cdf, (self.n, n_states)))
+        self.r = np.zeros(self.n)
+
+    def sample(self, cdf):
+        u = self.np_random.random((len(cdf), 1))
+        return (cdf > u).argmax(axis=-1)
+
+    def start(self, a=None, order=2):
+        self.order = order
+        return self.pm.percept_space[self.start_many()[0]]
+
+    def start_many(self):
+        return self.E0[self.s]
+
+    def react(self, h, a):
+        e, _ = self.react_many(np.full(self.n, self.am.action_space.index(a)))
+        return self.pm.percept_space[e[0]]
+
+    def react_many(self, a):
+        s_next = self.sample(self.cdf[a, self.s])
+        self.r = self.R[a, self.s, s_next]
+        e = self.E[a, self.s, s_next]
+        # restart the copies in the terminal states
+        done = self.terminal[s_next]
+        if done.any():
+            s_next[done] = self.sample(np.broadcast_to(self.initial_cdf, (done.sum(), len(self.initial_cdf))))
+        self.s = s_next
+        return e, self.r
+
+    def reward_func(self, h):
+        return self.r[0]
+
+class VectorSimulator(Simulator):
+    """
+    Runs the lockstep interaction loop of a batched agent and a VectorDomain:
+    act_many -> react_many -> learn_many (there are no histories).
+    The steps, the rate and the callbacks count the lockstep steps (i.e. n transitions per step).
+
+    agent -- Agent providing start(), act_many(e) and learn_many(e, a, r, e_next)
+    domain -- VectorDomain
+    order -- order of the agent in a step, i.e. 1: agent-initiated, 2: domain-initiated
+             (default: the order of the agent if it is set, otherwise 1)
+    callbacks -- (every, callback) pairs (default: no callbacks)
+    profiler -- Profiler of the agent and the domain, or True for a new one (default None)
+
+    """
+    def __init__(self, agent, domain, **kwargs):
+        super().__init__(agent, domain, **kwargs)
+        self.e = None # the last percepts
+        self.rewards = np.zeros(domain.n) # the accumulated rewards
+
+    def start(self):
+        self.agent.interact(self.domain)
+        if self.profiler is not None:
+            self.profiler.attach(self.agent, self.domain)
+        if self.order == 1:
+            # the first actions have no effect on the (tabular) domain
+            self.agent.start(order=1)
+            self.domain.order = 2
+        else:
+            self.agent.order = 2
+            self.domain.order = 1
+        self.e = self.domain.start_many()
+        self.started = True
+        return self
+
+    def loop(self, n):
+        act, react, learn = self.agent.act_many, self.domain.react_many, self.agent.learn_many
+        e, rewards = self.e, self.rewards
+        for _ in range(n):
+            a = act(e)
+            e_next, r = react(a)
+            learn(e, a, r, e_next)
+            rewards += r
+            e = e_next
+        self.e = e
+
+    def summary(self):
+        summary = super().summary()
+        summary['rewards'] = self.rewards.copy()
+        return summary
+
+    @property
+    def throughput(self):
+        # transitions per second
+        return self.rate * self.domain.n
+
+class Spec:
+    """
+    A picklable description of an experiment: the agent and the domain are built where the experiment runs
+    (e.g. in the workers of run_parallel). The agent and the domain get their own random number streams,
+    derived from the seed of the experiment, and the global random and np.random are seeded for the rest
+    (e.g. the random tie-breaking of the storages), so an experiment is reproducible by its seed.
+
+    agent -- class (or a picklable factory) of the agent
+    domain -- class (or a picklable factory) of the domain
+    steps -- number of steps
+    seed -- seed of the experiment (default 0)
+    agent_kwargs -- key-valued arguments of the agent (default: none)
+    domain_kwargs -- key-valued arguments of the domain (default: none)
+    history_kwargs -- key-valued arguments of the (shared) HistoryManager, e.g. a module-level state_map (default: none)
+    simulator -- Simulator or VectorSimulator (default Simulator)
+    simulator_kwargs -- key-valued arguments of the simulator (default: none)
+    summary -- picklable function of the simulator returning the result (default: the summary of the simulator)
+
+    """
+    def __init__(self, agent, domain, steps, **kwargs):
+        self.agent = agent
+        self.domain = domain
+        self.steps = steps
+        self.seed = kwargs.get('seed', 0)
+        self.agent_kwargs = kwargs.get('agent_kwargs', dict())
+        self.domain_kwargs = kwargs.get('domain_kwargs', dict())
+        self.history_kwargs = kwargs.get('history_kwargs', dict())
+        self.simulator = kwargs.get('simulator', Simulator)
+        self.simulator_kwargs = kwargs.get('simulator_kwargs', dict())
+        self.summary = kwargs.get('summary', None)
+
+    def seeds(self):
+        # independent streams of the agent, the domain and the globals
+        return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(self.seed).spawn(3)]
+
+    def build(self):
+        agent_seed, domain_seed, _ = self.seeds()
+        agent_kwargs = dict({'seed': agent_seed}, **self.agent_kwargs)
+        domain_kwargs = dict({'seed': domain_seed}, **self.domain_kwargs)
+        if issubclass(self.simulator, VectorSimulator):
+            # the vectorized objects keep no histories
+            return self.simulator(self.agent(**agent_kwargs), self.domain(**domain_kwargs), **self.simulator_kwargs)
+        hm = grl.HistoryManager(**self.history_kwargs)
+        return self.simulator(self.agent(hm, **agent_kwargs), self.domain(hm, **domain_kwargs), hm, **self.simulator_kwargs)
+
+    def run(self):
+        # the global random and np.random are seeded for the run and restored afterwards (e.g. in the current process)
+        states = random.getstate(), np.random.get_state()
+        try:
+            global_seed = self.seeds()[2]
+            random.seed(global_seed)
+            np.random.seed(global_seed)
+            simulator = self.build().run(self.steps)
+            return self.summary(simulator) if self.summary else simulator.summary()
+        finally:
+            random.setstate(states[0])
+            np.random.set_state(states[1])
+
+def run_spec(spec):
+    return spec.run()
+
+def run_parallel(specs, processes=None):
+    """
+    Runs the experiments in a pool of processes and returns their summaries (in the order of the specs).
+
+    specs -- Spec objects
+    processes -- number of processes (default: the number of cores; 1: in the current process)
+
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        return [run_spec(spec) for spec in specs]
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(run_spec, specs, chunksize=1)
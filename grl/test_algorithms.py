@@ -0,0 +1,133 @@
+import unittest
+import grl
+import numpy as np
+
+def chain_model():
+    # two states: 'go' moves to the other state, 'stay' stays; only staying at 1 is rewarded
+    T = grl.Storage(3, default=0.0)
+    r = grl.Storage(3, default=0.0)
+    T[0]['go'][1] = 1.0
+    T[0]['stay'][0] = 1.0
+    T[1]['go'][0] = 1.0
+    T[1]['stay'][1] = 1.0
+    r[1]['stay'][1] = 1.0
+    return T, r
+
+def random_model(n_states=10, n_actions=3, seed=0):
+    rng = np.random.default_rng(seed)
+    T = grl.Storage(3, default=0.0)
+    r = grl.Storage(3, default=0.0)
+    for s in range(n_states):
+        for a in range(n_actions):
+            for t, p in enumerate(rng.dirichlet(np.ones(n_states))):
+                T[s][a][t] = p
+                r[s][a][t] = rng.random()
+    return T, r
+
+class TabularTestCase(unittest.TestCase):
+
+    def test_compiled_model(self):
+        T, r = chain_model()
+        model = grl.TabularModel(T, r)
+        self.assertEqual(model.P.shape, (2, 2, 2))
+        self.assertEqual(model.PR[model.action_index['stay'], model.state_index[1]], 1.0)
+
+    def test_compiled_vi(self):
+        T, r = chain_model()
+        V = grl.VITabular(T, r, g=0.9, eps=1e-9)
+        V_loop = grl.VITabular(T, r, g=0.9, eps=1e-9, compiled=False)
+        self.assertAlmostEqual(V[1], 10.0, places=6)
+        self.assertAlmostEqual(V[0], 9.0, places=6)
+        for s in T:
+            self.assertAlmostEqual(V[s], V_loop[s], places=6)
+
+    def test_compiled_pi(self):
+        T, r = chain_model()
+        policy, V = grl.PITabular(T, r, g=0.9, eps=1e-9)
+        self.assertEqual(policy[0].argmax(), 'go')
+        self.assertEqual(policy[1].argmax(), 'stay')
+        self.assertAlmostEqual(V[0], 9.0, places=6)
+
+    def test_exact_evaluation(self):
+        T, r = chain_model()
+        for method in ['direct', 'krylov', 'auto']:
+            policy, V = grl.PITabular(T, r, g=0.999, method=method)
+            self.assertEqual(policy[0].argmax(), 'go')
+            self.assertAlmostEqual(V[1], 1000.0, places=4)
+            self.assertAlmostEqual(V[0], 999.0, places=4)
+
+    def test_krylov_accuracy(self):
+        T, r = random_model(n_states=30)
+        model, v = grl.batch_model([(T, r)], np.array([0.5, 0.999]))
+        for pi in [None, np.full(v.shape[:-1] + model.available.shape[-2:], 1 / model.available.shape[-2])]:
+            v_direct = grl.policy_evaluation(model, v, pi, g=np.array([0.5, 0.999]), method='direct')
+            v_krylov = grl.policy_evaluation(model, v, pi, g=np.array([0.5, 0.999]), method='krylov', eps=1e-8)
+            self.assertLess(np.abs(v_krylov - v_direct).max(), 1e-8)
+
+    def test_exact_evaluation_iterations(self):
+        T, r = chain_model()
+        model = grl.TabularModel(T, r)
+        v, pi, actions, iterations = grl.policy_iteration(model, np.zeros(len(model.states)), None, g=0.999, method='direct')
+        self.assertLessEqual(iterations, 3)
+
+    def test_batched_discounts(self):
+        T, r = chain_model()
+        V, sweeps = grl.VIBatch([(T, r)], g=np.array([0.5, 0.9]), eps=1e-9)
+        self.assertAlmostEqual(V[0][1], 2.0, places=6)
+        self.assertAlmostEqual(V[1][1], 10.0, places=6)
+        self.assertLess(sweeps[0], sweeps[1])
+
+    def test_batched_span_stopping(self):
+        T, r = random_model()
+        V, sweeps = grl.VIBatch([(T, r)], g=np.array([0.5, 0.999]), stop='span')
+        self.assertLess(sweeps[0], sweeps[1])
+        for V_k, g in zip(V, [0.5, 0.999]):
+            V_exact = grl.VITabular(T, r, g=g, eps=1e-12)
+            self.assertLess(max(abs(V_k[s] - V_exact[s]) for s in T), 1e-5)
+
+    def test_batched_models(self):
+        T, r = chain_model()
+        T_swap, r_swap = chain_model()
+        r_swap[1]['stay'][1] = 0.0
+        r_swap[0]['stay'][0] = 1.0
+        policy, V, iterations = grl.PIBatch([(T, r), (T_swap, r_swap)], g=0.9, method='direct')
+        self.assertEqual(policy[0][0].argmax(), 'go')
+        self.assertEqual(policy[1][0].argmax(), 'stay')
+        self.assertAlmostEqual(V[1][0], 10.0, places=6)
+        self.assertEqual(len(iterations), 2)
+
+    def test_span_stopping(self):
+        T, r = random_model()
+        model = grl.TabularModel(T, r)
+        v_exact = grl.policy_iteration(model, np.zeros(len(model.states)), None, g=0.9999, method='direct')[0]
+        _, sweeps_sup = grl.value_iteration(model, np.zeros(len(model.states)), g=0.9999, steps=1000)
+        for options in [{'stop':'span'}, {'relative':True}, {'relative':True, 'gauss_seidel':True}]:
+            v, sweeps = grl.value_iteration(model, np.zeros(len(model.states)), g=0.9999, **options)
+            self.assertLess(sweeps, 100)
+            self.assertLess(np.abs(v - v_exact).max(), 1e-5)
+        self.assertEqual(sweeps_sup, 1000)
+        V = grl.VITabular(T, r, g=0.9999, relative=True)
+        self.assertAlmostEqual(V[0], v_exact[model.state_index[0]], places=5)
+        with self.assertRaises(ValueError):
+            grl.value_iteration(model, np.zeros(len(model.states)), stop='span', gauss_seidel=True)
+
+    def test_prioritized_sweeping(self):
+        T, r = chain_model()
+        planner = grl.PrioritizedSweeping(T, r, g=0.9, budget=5, theta=1e-9)
+        for s in T:
+            for a in T[s]:
+                planner.update(s, a)
+        for _ in range(200):
+            policy, V = planner.plan()
+        self.assertEqual(policy[0].argmax(), 'go')
+        self.assertEqual(policy[1].argmax(), 'stay')
+        self.assertAlmostEqual(V[1], 10.0, places=5)
+        self.assertAlmostEqual(V[0], 9.0, places=5)
+
+    def test_prioritized_sweeping_budget(self):
+        T, r = chain_model()
+        planner = grl.PrioritizedSweeping(T, r, g=0.9, budget=1)
+        planner.update(1, 'stay')
+        planner.plan()
+        self.assertEqual(planner.V[1], 1.0)
+        self.assertEqual(planner.V[0], 0)
@@ -0,0 +1,46 @@
+import unittest
+import grl
+
+class CountingDomain(grl.Domain):
+
+    def setup(self):
+        self.am.action_space = ['a', 'b']
+        self.sm.state = 0
+        self.calls = 0
+
+    def start(self, a=None, order=2):
+        return 'e'
+
+    def react(self, h, a):
+        return 'e'
+
+    def oracle(self, h, *args, **kwargs):
+        self.calls += 1
+        q = grl.Storage(1, default=0.0, leaf_keys=self.am.action_space)
+        q['a'] = kwargs.get('g', 0.999) * self.sm.state
+        return q
+
+class OracleCacheTestCase(unittest.TestCase):
+
+    def test_cache(self):
+        domain = CountingDomain(oracle_cache_size=4)
+        h = grl.History(history=['e'], steplen=2)
+        q = domain.oracle(h, g=0.9)
+        self.assertIs(domain.oracle(h, g=0.9), q)
+        self.assertEqual(domain.calls, 1)
+        domain.oracle(h, g=0.5)
+        domain.sm.state = 1
+        self.assertEqual(domain.oracle(h, g=0.9)['a'], 0.9)
+        self.assertEqual(domain.calls, 3)
+        self.assertEqual((domain.oracle_cache.hits, domain.oracle_cache.misses), (1, 3))
+        domain.invalidate_oracle()
+        domain.oracle(h, g=0.9)
+        self.assertEqual(domain.calls, 4)
+
+    def test_no_cache(self):
+        domain = CountingDomain()
+        h = grl.History(history=['e'], steplen=2)
+        domain.oracle(h)
+        domain.oracle(h)
+        self.assertEqual(domain.calls, 2)
+        self.assertIsNone(domain.oracle_cache)
@@ -84,4 +84,249 @@ class StorageTestCase(unittest.TestCase):
         a[2][1][3] = 3
         self.assertEqual(a[2].max(), 3)
         self.assertEqual(a[1].max(), 5)
-        self.assertEqual(a[1][2].max(), 2)
\ No newline at end of file
+        self.assertEqual(a[1][2].max(), 2)
+
+    def test_operations(self):
+        a = grl.Storage(dimensions=1, default=0, leaf_keys=['x', 'y'])
+        a['x'] = 3
+        self.assertEqual(a + 1, {'x':4, 'y':1})
+        self.assertEqual(1 - a, {'x':-2, 'y':1})
+        self.assertEqual((a * {'x':2})['x'], 6)
+        self.assertEqual(len(a), 1)
+
+    def test_nested_operations(self):
+        a = grl.Storage(dimensions=3, default=0)
+        a[1][2][3] = 2
+        a[2][1][1] = 4
+        self.assertEqual((a * 2)[2][1][1], 8)
+        self.assertEqual((a / a)[1][2][3], 1)
+        self.assertEqual((a + a).sum(), 12)
+
+    def test_vectorized_operations(self):
+        a = grl.Storage(dimensions=1, default=0)
+        for i in range(2 * grl.Storage.vectorize_min):
+            a[i] = i
+        self.assertEqual((a * 2)[10], 20)
+        self.assertEqual((a - a).sum(), 0)
+
+    def test_vectorized_semantics(self):
+        n = 2 * grl.Storage.vectorize_min
+        rows = [[float(i) - 3.5 for i in range(n)], list(range(-3, n - 3)), [2**40 + i for i in range(n)], 
+                [0.5] * (n - 1) + [0], [True] * n]
+        operators = ['__add__', '__sub__', '__mul__', '__truediv__', '__floordiv__', '__mod__', '__pow__', '__rtruediv__']
+        def result(x, y, op, vectorize_min):
+            a, b = grl.Storage(1), grl.Storage(1)
+            a.vectorize_min = vectorize_min
+            for i in range(n):
+                a[i], b[i] = x[i], y[i]
+            try:
+                c = getattr(a, op)(b)
+            except Exception as e:
+                return type(e)
+            return [(type(c[i]), c[i]) for i in range(n)]
+        for x in rows:
+            for y in rows:
+                for op in operators:
+                    # (2**40)**(2**40) does not finish
+                    if op == '__pow__' and (x is rows[2] or y is rows[2]):
+                        continue
+                    self.assertEqual(result(x, y, op, n), result(x, y, op, 10**9), (x[:2], y[:2], op))
+
+    def test_inplace_operations(self):
+        a = grl.Storage(dimensions=3, default=0, leaf_keys=['x', 'y'])
+        a[1][2]['x'] = 2
+        row = a[1][2]
+        a[1][2] *= 3
+        a[1][2] += {'y':1}
+        self.assertIs(a[1][2], row)
+        self.assertIs(row.parent, a[1])
+        self.assertEqual(row, {'x':6, 'y':1})
+        self.assertFalse(row.missing_keys)
+        a[1] -= 1
+        self.assertEqual(row['x'], 5)
+    def test_indexed_max(self):
+        a = grl.Storage(dimensions=2, indexed=True, default=0)
+        a[1]['x'] = 2
+        a[1]['y'] = 5
+        a[1]['z'] = 5
+        self.assertEqual(a[1].argmax(), 'y')
+        a[1]['y'] = 1
+        self.assertEqual(a[1].argmax(), 'z')
+        del a[1]['z']
+        self.assertEqual(a[1].max(), 2)
+        self.assertEqual(a[1].argmin(), 'y')
+        a[1] *= -1
+        self.assertEqual(a[1].argmax(), 'y')
+        self.assertEqual((a[1] + 3).min(), 1)
+
+    def test_indexed_missing_argmax(self):
+        a = grl.Storage(dimensions=1, indexed=True, leaf_keys=['x', 'y', 'z'], default=1)
+        a['x'] = 0
+        self.assertIn(a.argmax(), ['y', 'z'])
+        self.assertEqual(a.argmin(), 'x')
+        self.assertEqual(len(a), 1)
+
+
+class DenseStorageTestCase(unittest.TestCase):
+
+    def test_dense_storage(self):
+        a = grl.DenseStorage(dimensions=3)
+        a[1][2][3] = 4
+        self.assertEqual(a[1][2][3], 4)
+
+    def test_dense_growth(self):
+        a = grl.DenseStorage(dimensions=2, capacity=1)
+        for i in range(10):
+            a[i][i] = i
+        self.assertEqual(len(a), 10)
+        self.assertEqual(a[9][9], 9)
+        self.assertEqual(a.sum(), 45)
+
+    def test_dense_non_persist_access(self):
+        a = grl.DenseStorage(dimensions=2, persist=False, default=(0,1))
+        self.assertNotEqual(a[1][2], a[1][2])
+        self.assertEqual(len(a), 0)
+
+    def test_dense_max(self):
+        a = grl.DenseStorage(dimensions=3, leaf_keys=range(4), default=(0,1))
+        a[1][2][3]
+        a[1][2][1] = 5
+        a[1][2][2]
+        self.assertEqual(a[1][2].max(), 5)
+        self.assertEqual(a[1][2].argmax(), 1)
+
+    def test_dense_missing_argmax(self):
+        a = grl.DenseStorage(dimensions=1, leaf_keys=['x', 'y', 'z'], default=1)
+        a['x'] = 0
+        self.assertIn(a.argmax(), ['y', 'z'])
+        self.assertEqual(a.max(), 1)
+        self.assertEqual(a.sum(), 2)
+
+    def test_dense_nested_sum(self):
+        a = grl.DenseStorage(dimensions=3, default=0)
+        a[1][2][3] = 2
+        a[1][1][1] = 5
+        a[1][2][2] = 2
+        self.assertEqual(a[2].sum(), 0)
+        self.assertEqual(a[1].sum(), 9)
+        self.assertEqual(a[1][2].sum(), 4)
+
+    def test_dense_clear(self):
+        a = grl.DenseStorage(dimensions=2, leaf_keys=['x', 'y'], default=0.5)
+        a[0].clear()
+        a[0]['x'] = 1
+        self.assertEqual(list(a[0]), ['x'])
+        self.assertEqual(a[0].sum(), 1)
+
+    def test_dense_accessed_rows(self):
+        # the rows which are only read exist, as in Storage
+        for cls in (grl.Storage, grl.DenseStorage):
+            a = cls(dimensions=3, default=1, leaf_keys=['x', 'y', 'z'])
+            a[1][2]['x'] = 5
+            a[1][3]
+            a[2][1]['y'] = 4
+            a[3]
+            self.assertEqual((a.sum(), a[1].sum(), len(a), sorted(a[1])), (16, 10, 3, [2, 3]), cls)
+            del a[1]
+            self.assertEqual((a.sum(), sorted(a)), (6, [2, 3]), cls)
+
+    def test_dense_views(self):
+        a = grl.DenseStorage(dimensions=3, default=0)
+        a[1][2][3] = 2
+        row = a[1][2]
+        self.assertIs(a[1][2], row)
+        self.assertFalse(hasattr(row, '__dict__') and row.__dict__)
+        a[1][2] *= 3
+        self.assertIs(a[1][2], row)
+        self.assertEqual(row[3], 6)
+
+    def test_dense_avg(self):
+        a = grl.DenseStorage(dimensions=1, default=0)
+        a['x'] = 1
+        a['y'] = 3
+        self.assertEqual(a.avg(), 2)
+        self.assertEqual(a.avg({'x':0.25, 'y':0.75}), 2.5)
+
+    def test_dense_operations(self):
+        a = grl.DenseStorage(dimensions=3, default=0)
+        a[1][2][3] = 2
+        a[2][1][1] = 4
+        self.assertEqual((a * 2)[2][1][1], 8)
+        self.assertEqual((1 - a[1][2])[3], -1)
+        self.assertEqual((a - a).sum(), 0)
+
+    def test_dense_inplace_operations(self):
+        a = grl.DenseStorage(dimensions=3, default=0)
+        a[1][2][3] = 2
+        a[1][2] *= 3
+        a[1][2][3] += 1
+        a *= 2
+        self.assertEqual(a[1][2][3], 14)
+        self.assertEqual(len(a[1][2]), 1)
+
+
+class FlatStorageTestCase(unittest.TestCase):
+
+    def test_flat_storage(self):
+        a = grl.FlatStorage(dimensions=3)
+        a[1][2][3] = 4
+        self.assertEqual(a[1][2][3], 4)
+        self.assertEqual(a.table, {(1, 2):{3:4}})
+        self.assertIsInstance(a[1][2], grl.Storage)
+
+    def test_flat_non_persist_access(self):
+        a = grl.FlatStorage(dimensions=2, persist=False, default=(0,1))
+        self.assertNotEqual(a[1][2], a[1][2])
+        self.assertEqual(len(a), 0)
+
+    def test_flat_max(self):
+        a = grl.FlatStorage(dimensions=3, leaf_keys=range(4), default=(0,1))
+        a[1][2][3]
+        a[1][2][1] = 5
+        a[1][2][2]
+        self.assertEqual(a[1][2].max(), 5)
+        self.assertEqual(a[1][2].argmax(), 1)
+
+    def test_flat_nested_sum(self):
+        a = grl.FlatStorage(dimensions=3, default=0)
+        a[1][2][3] = 2
+        a[1][1][1] = 5
+        a[1][2][2] = 2
+        self.assertEqual(a[2].sum(), 0)
+        self.assertEqual(a[1].sum(), 9)
+        self.assertEqual(a[1][2].sum(), 4)
+
+    def test_flat_delete(self):
+        a = grl.FlatStorage(dimensions=3, default=0)
+        a[1][2][3] = 2
+        a[2][1][1] = 4
+        del a[1]
+        self.assertEqual(list(a), [2])
+        self.assertEqual(a.sum(), 4)
+
+    def test_flat_operations(self):
+        a = grl.FlatStorage(dimensions=3, default=0)
+        a[1][2][3] = 2
+        a[1][2] *= 3
+        a[1][2][3] += 1
+        self.assertEqual(a[1][2][3], 7)
+        self.assertEqual((a * 2)[1][2][3], 14)
+
+    def test_flat_late_leaf_keys(self):
+        a = grl.FlatStorage(dimensions=2, default=0)
+        a[1][2] = 3
+        a.set_leaf_keys(range(4))
+        self.assertEqual(a[1].missing_keys, {0, 1, 3})
+        self.assertEqual(sorted(a[1]), [0, 1, 2, 3])
+        self.assertEqual(a[1].sum(), 3)
+
+    def test_flat_views(self):
+        a = grl.FlatStorage(dimensions=3, default=0)
+        a[1][2][3] = 2
+        self.assertIs(a[1][2], a[1][2])
+        view = a[1]
+        del a[1]
+        self.assertIsNot(a[1], view)
+        self.assertEqual(a[1].sum(), 0)
+        a[1][2][3] = 4
+        self.assertEqual(view[2][3], 4)
@@ -0,0 +1,292 @@
+import unittest
+import collections
+import grl
+import threading
+import numpy as np
+
+class HistoryTestCase(unittest.TestCase):
+
+    def test_history(self):
+        h = grl.History(history=range(5), capacity=2)
+        self.assertEqual(list(h), [0, 1, 2, 3, 4])
+        self.assertEqual(h[2], 2)
+        self.assertEqual(h[-1], 4)
+        with self.assertRaises(IndexError):
+            h[5]
+
+    def test_maxlen(self):
+        h = grl.History(maxlen=3)
+        for x in range(100):
+            h.append(x)
+        self.assertEqual(list(h), [97, 98, 99])
+        self.assertLessEqual(len(h.buffer), 16)
+
+    def test_tail(self):
+        for codes in (False, True):
+            h = grl.History(history=['x', 'y', 'z'], maxlen=3, codes=codes)
+            for x in ['w', 'v']:
+                h.append(x)
+            h.xappend('u')
+            self.assertEqual([h[-1], h[-2], h[-4]], ['u', 'v', 'z'])
+            self.assertEqual(h[np.int64(-1)], 'u')
+            with self.assertRaises(IndexError):
+                h[-5]
+
+    def test_extension(self):
+        hm = grl.HistoryManager(history=['e0', 'a1', 'e1'], maxlen=2)
+        hm.extend(['a2', 'e2'])
+        self.assertEqual(list(hm.h.history), ['e0', 'a1', 'e1'])
+        self.assertEqual(list(hm.h.extension), ['a2', 'e2'])
+        self.assertEqual(hm.h[-1], 'e2')
+        hm.record(['a', 'e'])
+        self.assertEqual(list(hm.h), ['a1', 'e1', 'a', 'e', 'a2', 'e2'])
+        self.assertEqual(hm.xdrop(), ['a2', 'e2'])
+        self.assertEqual(hm.drop(), ['a', 'e'])
+        self.assertEqual(list(hm.h), ['a1', 'e1'])
+
+    def test_codes(self):
+        h = grl.History(history=['x', 'y', 'x'], codes=True)
+        h.extension.append('z')
+        self.assertEqual(list(h), ['x', 'y', 'x', 'z'])
+        self.assertEqual(h.buffer[:4].tolist(), [0, 1, 0, 2])
+        self.assertEqual(h.pop(), 'z')
+
+    def test_slicing(self):
+        hm = grl.HistoryManager(history=['e0', 'a1', 'e1', 'a2', 'e2'])
+        hm.extend(['a3', 'e3'])
+        self.assertEqual(hm.h[1:3], ['a1', 'e1'])
+        self.assertEqual(hm.h[-3:], ['e2', 'a3', 'e3'])
+        self.assertEqual(hm.h[::2][1:], ['e1', 'e2', 'e3'])
+        self.assertEqual(hm.h.extension[:1], ['a3'])
+        self.assertTrue(hm.h[1:3].array.base is not None)
+        with self.assertRaises(ValueError):
+            hm.h[1:3].array[0] = 'x'
+
+    def test_window(self):
+        h = grl.History(history=['x', 'y', 'x', 'z', 'y'], steplen=2, codes=True)
+        self.assertEqual(h.window(1), ['z', 'y'])
+        self.assertEqual(h.window(1.5), ['x', 'z', 'y'])
+        self.assertEqual(h.window(10), list(h))
+        self.assertEqual(h.window(0), [])
+
+class OverlayTestCase(unittest.TestCase):
+
+    class Listener:
+        def __init__(self):
+            self.events = 0
+        def on(self, event):
+            self.events += 1
+
+    def test_overlay(self):
+        hm = grl.HistoryManager(history=['e0', 'a1', 'e1'])
+        hm.h.steps = 1.5
+        h_next = grl.Overlay(hm.h, grl.Index.NEXT, ['a2', 'e2'])
+        self.assertEqual(list(h_next), ['e0', 'a1', 'e1', 'a2', 'e2'])
+        self.assertEqual(h_next.t, 2.5)
+        self.assertEqual(h_next[-3:], ['e1', 'a2', 'e2'])
+        self.assertEqual(h_next.extract(1), 'e2')
+        h_prev = grl.Overlay(hm.h, grl.Index.PREVIOUS)
+        self.assertEqual(list(h_prev), ['e0'])
+        self.assertEqual(h_prev.t, 0.5)
+        self.assertEqual(len(hm.h), 3)
+
+    def test_state(self):
+        for overlay in [True, False]:
+            listener = self.Listener()
+            hm = grl.HistoryManager(state_map=lambda h, *x, **y: (h.t, h[-1]), history=['e0', 'a1', 'e1'], overlay=overlay)
+            hm.h.steps = 1.5
+            hm.register(listener, grl.EventType.ADD)
+            self.assertEqual(hm.state(hm.h, extension=['a2', 'e2'], index=grl.Index.NEXT), (2.5, 'e2'))
+            hm.extend(['a2', 'e2'], notify=False)
+            self.assertEqual(hm.state(hm.h, index=grl.Index.PREVIOUS), (1.5, 'e1'))
+            hm.xdrop(notify=False)
+            self.assertEqual(hm.state(hm.h), (1.5, 'e1'))
+            self.assertEqual(list(hm.h), ['e0', 'a1', 'e1'])
+            self.assertEqual(listener.events == 0, overlay)
+        rm = grl.RewardManager(lambda h: h.t)
+        self.assertEqual(rm.r(hm.h, extension=['a2', 'e2'], index=grl.Index.NEXT), 2.5)
+
+    def test_foreign_history(self):
+        listener = self.Listener()
+        listener.lock = threading.Lock() # not copyable
+        hm = grl.HistoryManager(state_map=lambda h, *x, **y: h[-1], history=['e0'], overlay=False, 
+                                statistics=True, cache_size=2, maxlen=2)
+        hm.register(listener, grl.EventType.ADD)
+        hm.state(hm.h)
+        counts, cached = dict(hm.statistics.counts), list(hm.cache.states)
+        h = grl.History(history=['e1', 'a2', 'e2'], steplen=2)
+        self.assertEqual(hm.state(h, extension=['a3', 'e3'], index=grl.Index.NEXT), 'e3')
+        self.assertEqual(hm.state(h), 'e2')
+        self.assertEqual(list(h), ['e1', 'a2', 'e2'])
+        self.assertEqual(list(hm.h), ['e0'])
+        # the foreign changes are not seen by the own listeners, statistics and cache
+        self.assertEqual(listener.events, 0)
+        self.assertEqual((dict(hm.statistics.counts), list(hm.cache.states)), (counts, cached))
+        self.assertEqual((len(hm.listeners[grl.EventType.ADD]), hm.pool, hm.pending), (3, [], []))
+
+class StateCacheTestCase(unittest.TestCase):
+
+    def test_cache(self):
+        calls = list()
+        def state_map(h, *args, **kwargs):
+            calls.append(h.t)
+            return h[-1]
+        hm = grl.HistoryManager(state_map=state_map, history=['e0'], cache_size=2)
+        self.assertEqual(hm.state(hm.h), 'e0')
+        self.assertEqual(hm.state(hm.h), 'e0')
+        self.assertEqual(hm.state(hm.h, extension=['a1', 'e1'], index=grl.Index.NEXT), 'e1')
+        self.assertEqual(hm.state(hm.h, extension=['a1', 'e1'], index=grl.Index.NEXT), 'e1')
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((hm.cache.hits, hm.cache.misses), (2, 2))
+        hm.record(['a1', 'e1'])
+        self.assertEqual(hm.state(hm.h), 'e1')
+        self.assertEqual(len(calls), 3)
+        # unhashable arguments are not cached
+        hm.state(hm.h, q={})
+        hm.state(hm.h, q={})
+        self.assertEqual(len(calls), 5)
+
+    def test_lru(self):
+        hm = grl.HistoryManager(state_map=lambda h, *x, **y: y.get('k'), cache_size=2)
+        for k in [1, 2, 1, 3]:
+            hm.state(hm.h, k=k)
+        self.assertEqual([key[-1][0][1] for key in hm.cache.states], [1, 3])
+
+class DispatchTestCase(unittest.TestCase):
+
+    class Recorder:
+        def __init__(self):
+            self.updates = list()
+        def on(self, event):
+            self.updates.append((event.type, list(event.data['update'])))
+
+    def test_subscriptions(self):
+        hm = grl.HistoryManager()
+        everything, hash_symbols, percepts = self.Recorder(), self.Recorder(), self.Recorder()
+        hm.register(everything)
+        hm.register(hash_symbols, grl.EventType.ADD, symbols=['#'])
+        hm.register(percepts, grl.EventType.ADD, symbols=['#'], positions=[1])
+        hm.record(['up', '@'])
+        hm.record(['#', '@'])
+        hm.record(['up', '#'])
+        hm.drop()
+        self.assertEqual(len(everything.updates), 4)
+        self.assertEqual(hash_symbols.updates, [(grl.EventType.ADD, ['#', '@']), (grl.EventType.ADD, ['up', '#'])])
+        self.assertEqual(percepts.updates, [(grl.EventType.ADD, ['up', '#'])])
+        hm.deregister(everything)
+        hm.record(['up', '@'])
+        self.assertEqual(len(everything.updates), 4)
+        self.assertEqual(len(hm.pool), 1)
+
+    def test_batch(self):
+        class Domain:
+            def on(self, event):
+                grl.occurrence_ratio_processor('domain', '#', event)
+        items = [['up', '#'], ['up', '@'], ['stay', '#'], ['down', '@']]
+        hm, hm_batch = grl.HistoryManager(), grl.HistoryManager()
+        hm.register(Domain())
+        recorder = self.Recorder()
+        hm_batch.register(Domain())
+        hm_batch.register(recorder)
+        for step in items:
+            hm.record(step)
+        with hm_batch.batch():
+            for step in items:
+                hm_batch.record(step)
+            self.assertEqual(recorder.updates, [])
+        self.assertEqual(len(recorder.updates), 1)
+        self.assertAlmostEqual(hm_batch.h.stats['domain']['#'], hm.h.stats['domain']['#'])
+        self.assertEqual(hm_batch.h.t, 4.0)
+
+class StatisticsTestCase(unittest.TestCase):
+
+    def test_counts(self):
+        hm = grl.HistoryManager(statistics=True)
+        hm.record(['up', '#'])
+        hm.record(['up', '@'])
+        hm.record(['stay', '#'])
+        hm.extend(['up', '#'])
+        stats = hm.h.stats
+        self.assertEqual(stats.count('#'), 3)
+        self.assertEqual(stats.count('up', 0), 3)
+        self.assertEqual(stats.count('up', 1), 0)
+        self.assertEqual(stats.steps[('up', '#')], 2)
+        self.assertEqual(stats.ratio('#'), 0.75)
+        hm.xdrop()
+        self.assertEqual(stats.steps[('up', '#')], 1)
+        self.assertAlmostEqual(stats.ratio('#'), 2/3)
+
+    def test_window(self):
+        hm = grl.HistoryManager(statistics=True, maxlen=3)
+        steps = [['a', 'x'], ['b', 'x'], ['a', 'y'], ['a', 'x'], ['b', 'y'], ['b', 'x'], ['a', 'y']]
+        for step in steps:
+            hm.record(step)
+            window = list(hm.h)
+            for symbol in 'abxy':
+                self.assertEqual(hm.h.stats.count(symbol), window.count(symbol))
+            pairs = list(zip(window[::2], window[1::2]))
+            for pair in set(steps_ for steps_ in map(tuple, steps)):
+                self.assertEqual(hm.h.stats.steps[pair], pairs.count(pair))
+        self.assertEqual(hm.h.stats.ratio('a'), 1/3)
+
+    def test_domain_initiated_window(self):
+        hm = grl.HistoryManager(statistics=True, maxlen=1)
+        hm.record(['e0'])
+        for step in [['a', 'x'], ['b', 'y'], ['c', 'z']]:
+            hm.record(step)
+        stats = hm.h.stats
+        self.assertEqual(list(hm.h), ['c', 'z'])
+        self.assertEqual(+stats.steps, {('c', 'z'): 1})
+        hm.drop(1.0)
+        self.assertEqual(+stats.steps, dict())
+        self.assertEqual(min(stats.steps.values()), 0)
+        self.assertEqual(+stats.counts, dict())
+
+    def test_straddling_window(self):
+        # the (action, percept) steps start at position 1, the window cuts them
+        hm = grl.HistoryManager(statistics=True, maxlen=2)
+        hm.record(['e0'])
+        absolute = ['e0']
+        for items in [['a', 'x'], ['b'], ['y', 'c', 'z'], ['d', 'w'], ['e'], ['v'], ['p', 'q', 'r', 's']]:
+            hm.record(items)
+            absolute += items
+            window = list(hm.h)
+            first = len(absolute) - len(window)
+            expected = collections.Counter(tuple(absolute[i:i + 2]) for i in range(1, len(absolute) - 1, 2) if i >= first)
+            self.assertEqual(+hm.h.stats.steps, expected)
+            self.assertEqual(+hm.h.stats.counts, collections.Counter(window))
+
+    def test_decay(self):
+        hm = grl.HistoryManager(statistics=True, decay=0.5)
+        hm.record(['a', '#'])
+        hm.record(['a', '@'])
+        hm.record(['a', '@'])
+        self.assertAlmostEqual(hm.h.stats.decayed_count('#'), 0.25)
+        self.assertAlmostEqual(hm.h.stats.ratio('#', decayed=True), 0.25 / 1.75)
+        self.assertEqual(hm.h.stats.ratio('#'), 1/3)
+
+class InternerTestCase(unittest.TestCase):
+
+    def test_interner(self):
+        symbols = grl.Interner(['up', 'down'])
+        self.assertEqual(symbols.intern('down'), 1)
+        self.assertEqual(symbols.intern(((0, 1), 0)), 2)
+        self.assertEqual(symbols.symbol(2), ((0, 1), 0))
+        self.assertEqual(symbols.decode(symbols.encode(['up', ((0, 1), 0)])), ['up', ((0, 1), 0)])
+        self.assertEqual(len(symbols), 3)
+
+    def test_managers(self):
+        am = grl.ActionManager()
+        am.action_space = ['up', 'stay', 'down']
+        self.assertEqual(am.symbols.intern('down'), 2)
+        sm = grl.StateManager(state_space=[(0, 0), (0, 1)])
+        self.assertEqual(sm.symbols.symbol(1), (0, 1))
+        hm = grl.HistoryManager(state_map=lambda h, *x, **y: (0.5, h[-1]), history=['@'], codes=am.symbols)
+        self.assertEqual(hm.state_id(hm.h), 0)
+        self.assertEqual(hm.states.symbol(0), (0.5, '@'))
+        hm.record(['up', '#'])
+        self.assertEqual(hm.state_id(hm.h), 1)
+        self.assertEqual(hm.h.buffer[:3].tolist(), [3, 0, 4])
+        self.assertEqual(list(hm.h), ['@', 'up', '#'])
+        h = grl.History(history=['x'], codes=grl.Interner())
+        self.assertEqual(h.buffer[0], 0)
@@ -0,0 +1,85 @@
+import unittest
+import grl
+from grl.test_simulators import EchoDomain, CyclingAgent
+
+class StateAgent(CyclingAgent):
+
+    def act(self, h):
+        self.hm.state(h)
+        return super().act(h)
+
+    def learn(self, h, a, e):
+        self.rm.r(h, extension=[a, e], index=grl.Index.NEXT)
+        super().learn(h, a, e)
+
+class RewardDomain(EchoDomain):
+
+    def reward_func(self, h):
+        return 1 if h[-1] == 'A' else 0
+
+class OracleDomain(RewardDomain):
+
+    def oracle(self, h, *args, **kwargs):
+        self.calls = getattr(self, 'calls', 0) + 1
+        return len(h)
+
+class ProfilerTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        grl.profile(None)
+
+    def test_simulator(self):
+        hm = grl.HistoryManager()
+        agent, domain = StateAgent(hm), RewardDomain(hm)
+        sim = grl.Simulator(agent, domain, profiler=True).run(10)
+        stats = sim.summary()['profile']
+        # the dispatch also counts the first step
+        self.assertEqual({phase: stats[phase][0] for phase in stats}, 
+                         {'act': 10, 'react': 10, 'learn': 10, 'state': 10, 'reward': 10, 'dispatch': 11})
+        self.assertGreaterEqual(stats['act'][1], stats['state'][1])
+        self.assertIs(agent.profiler, sim.profiler)
+        self.assertIn('dispatch', str(sim.profiler))
+
+    def test_detach(self):
+        hm = grl.HistoryManager()
+        agent, domain = StateAgent(hm), RewardDomain(hm)
+        profiler = grl.Profiler().attach(agent, domain)
+        self.assertIn('act', agent.__dict__)
+        profiler.detach()
+        self.assertEqual(set(agent.__dict__) & {'act', 'learn', 'oracle'}, set())
+        self.assertNotIn('state', hm.__dict__)
+        self.assertIsNone(agent.profiler)
+        grl.Simulator(agent, domain).run(3)
+        self.assertEqual(profiler.stats(), dict())
+
+    def test_global(self):
+        profiler = grl.profile()
+        hm = grl.HistoryManager()
+        agent, domain = StateAgent(hm), RewardDomain(hm)
+        grl.Simulator(agent, domain).run(4)
+        self.assertEqual(profiler.calls['learn'], 4)
+        self.assertEqual(profiler.calls['state'], 4)
+        grl.profile(None)
+        self.assertIsNone(CyclingAgent().profiler)
+
+    def test_oracle(self):
+        hm = grl.HistoryManager()
+        agent, domain = StateAgent(hm), OracleDomain(hm)
+        profiler = grl.Profiler().attach(agent, domain)
+        agent.interact(domain)
+        agent.oracle(hm.h)
+        self.assertEqual(profiler.calls['oracle'], 1)
+        profiler.detach()
+        self.assertNotIn('oracle', domain.__dict__)
+        self.assertEqual(agent.oracle, domain.oracle)
+
+    def test_global_cached_oracle(self):
+        profiler = grl.profile()
+        hm = grl.HistoryManager()
+        agent, domain = StateAgent(hm), OracleDomain(hm, oracle_cache_size=4)
+        grl.Simulator(agent, domain).run(2)
+        agent.oracle(hm.h)
+        agent.oracle(hm.h)
+        self.assertEqual((profiler.calls['oracle'], domain.calls), (2, 1))
+        profiler.detach()
+        self.assertEqual(domain.oracle, domain.cached_oracle)
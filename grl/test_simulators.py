@@ -0,0 +1,180 @@
+import unittest
+import pickle
+import random
+import numpy as np
+import grl
+
+class EchoDomain(grl.Domain):
+
+    def setup(self):
+        self.am.action_space = ['a', 'b']
+        self.events = 0
+
+    def start(self, a=None, order=2):
+        self.order = order
+        return 'e'
+
+    def react(self, h, a):
+        return a.upper()
+
+    def on(self, event):
+        self.events += 1
+
+class CyclingAgent(grl.Agent):
+
+    def setup(self):
+        self.learned = list()
+
+    def start(self, e=None, order=1):
+        self.order = order
+        return 'b'
+
+    def act(self, h):
+        return 'a' if h[-1] != 'A' else 'b'
+
+    def learn(self, h, a, e):
+        self.learned.append((h.t, a, e))
+
+class CoinDomain(grl.Domain):
+
+    def setup(self):
+        self.am.action_space = ['a', 'b']
+
+    def start(self, a=None, order=2):
+        self.order = order
+        return 'H'
+
+    def react(self, h, a):
+        return grl.epsilon_sample(['H', 'T'], rng=self.random)
+
+class RandomVectorAgent(grl.Agent):
+
+    def start(self, e=None, order=1):
+        self.order = order
+
+    def act(self, h):
+        return grl.epsilon_sample(self.am.action_space, rng=self.random)
+
+    def learn(self, h, a, e):
+        return
+
+    def act_many(self, e):
+        return self.np_random.integers(len(self.am.action_space), size=len(e))
+
+    def learn_many(self, e, a, r, e_next):
+        return
+
+def heads(simulator):
+    return list(simulator.hm.h).count('H')
+
+class SimulatorTestCase(unittest.TestCase):
+
+    def test_agent_initiated(self):
+        hm = grl.HistoryManager()
+        agent, domain = CyclingAgent(hm), EchoDomain(hm)
+        sim = grl.Simulator(agent, domain).run(4)
+        self.assertEqual(list(hm.h), ['b', 'e', 'a', 'A', 'b', 'B', 'a', 'A', 'b', 'B'])
+        self.assertEqual(agent.learned[0], (1.0, 'a', 'A'))
+        self.assertEqual((sim.steps, hm.h.t, domain.events, agent.order), (4, 5.0, 5, 1))
+        self.assertGreater(sim.rate, 0.0)
+
+    def test_domain_initiated(self):
+        hm = grl.HistoryManager()
+        agent, domain = CyclingAgent(hm, order=2), EchoDomain(hm)
+        grl.Simulator(agent, domain, register=False).run(2)
+        self.assertEqual(list(hm.h), ['e', 'a', 'A', 'b', 'B'])
+        self.assertEqual(agent.learned, [(0.5, 'a', 'A'), (1.5, 'b', 'B')])
+        self.assertEqual(domain.events, 0)
+
+    def test_callbacks(self):
+        hm = grl.HistoryManager()
+        calls = list()
+        sim = grl.Simulator(CyclingAgent(hm), EchoDomain(hm), callbacks=[(3, lambda s: calls.append(('3', s.steps)))])
+        sim.add(5, lambda s: calls.append(('5', len(s.hm.h))))
+        sim.run(7).run(5)
+        self.assertEqual(calls, [('3', 3), ('5', 12), ('3', 6), ('3', 9), ('5', 22), ('3', 12)])
+        self.assertEqual(sim.steps, 12)
+
+class VectorDomainTestCase(unittest.TestCase):
+
+    def chain(self, n):
+        # 'r' moves right (and 'l' left) on a chain of 3 states, the last state is rewarded and restarts at 0
+        P = [[[1, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 0], [0, 0, 1], [0, 0, 1]]]
+        R = [[0, 0, 1]]
+        return grl.VectorDomain(n=n, P=P, R=R, actions=['l', 'r'], initial=[1, 0, 0], terminal=[2], seed=0)
+
+    def test_react_many(self):
+        domain = self.chain(4)
+        self.assertEqual(domain.start_many().tolist(), [0] * 4)
+        e, r = domain.react_many(np.array([1, 1, 0, 0]))
+        self.assertEqual((e.tolist(), r.tolist()), ([1, 1, 0, 0], [0, 0, 0, 0]))
+        e, r = domain.react_many(np.array([1, 0, 1, 0]))
+        self.assertEqual((e.tolist(), r.tolist()), ([2, 0, 1, 0], [1, 0, 0, 0]))
+        self.assertEqual(domain.s.tolist(), [0, 0, 1, 0])
+        self.assertEqual(domain.react(None, 'r'), 1)
+        self.assertEqual(domain.reward_func(None), 0.0)
+
+    def test_stochastic(self):
+        domain = grl.VectorDomain(n=10000, P=[[[0.25, 0.75], [0.25, 0.75]]], seed=1)
+        e, _ = domain.react_many(np.zeros(10000, dtype=int))
+        self.assertAlmostEqual(e.mean(), 0.75, delta=0.02)
+
+    def test_simulator(self):
+        class RightAgent(grl.Agent):
+            def start(self, e=None, order=1):
+                self.order = order
+            def act(self, h):
+                return
+            def learn(self, h, a, e):
+                return
+            def act_many(self, e):
+                return np.ones(len(e), dtype=int)
+            def learn_many(self, e, a, r, e_next):
+                self.last = (e, a, r, e_next)
+        agent, domain = RightAgent(), self.chain(3)
+        sim = grl.VectorSimulator(agent, domain).run(6)
+        self.assertEqual(sim.rewards.tolist(), [3.0] * 3)
+        self.assertEqual(sim.e.tolist(), [2] * 3)
+        self.assertEqual((sim.steps, domain.order, agent.order), (6, 2, 1))
+
+class ParallelTestCase(unittest.TestCase):
+
+    def specs(self):
+        vector = {'n': 8, 'P': [[[0.5, 0.5], [0.5, 0.5]], [[0.9, 0.1], [0.9, 0.1]]], 'R': [[0, 1]]}
+        return [grl.Spec(RandomVectorAgent, grl.VectorDomain, 50, seed=seed, domain_kwargs=vector, 
+                         simulator=grl.VectorSimulator) for seed in range(3)] + \
+               [grl.Spec(RandomVectorAgent, CoinDomain, 50, seed=seed, summary=heads) for seed in range(3)]
+
+    def test_reproducible(self):
+        results = grl.run_parallel(self.specs(), processes=2)
+        self.assertEqual([r['rewards'].tolist() for r in results[:3]], 
+                         [r['rewards'].tolist() for r in grl.run_parallel(self.specs()[:3], processes=1)])
+        self.assertEqual(results[3:], grl.run_parallel(self.specs()[3:], processes=1))
+        self.assertNotEqual(results[0]['rewards'].tolist(), results[1]['rewards'].tolist())
+        self.assertEqual(results[0]['steps'], 50)
+
+    def test_pickle(self):
+        hm = grl.HistoryManager()
+        agent, domain = RandomVectorAgent(hm, seed=1), CoinDomain(hm, seed=2)
+        grl.Simulator(agent, domain).run(5)
+        agent, domain = pickle.loads(pickle.dumps((agent, domain)))
+        self.assertEqual(len(agent.hm.h), 12)
+        self.assertIs(agent.hm, domain.hm)
+
+    def test_global_state(self):
+        random.seed(3)
+        np.random.seed(3)
+        expected = random.random(), np.random.random()
+        random.seed(3)
+        np.random.seed(3)
+        grl.run_parallel(self.specs()[3:4], processes=1)
+        self.assertEqual((random.random(), np.random.random()), expected)
+
+    def test_global_seeding(self):
+        random.seed(5)
+        first = CoinDomain(), CoinDomain()
+        random.seed(5)
+        second = CoinDomain(), CoinDomain()
+        self.assertEqual([d.seed for d in first], [d.seed for d in second])
+        self.assertNotEqual(first[0].seed, first[1].seed)
+        self.assertEqual(first[0].random.random(), second[0].random.random())
@@ -0,0 +1,84 @@
+import unittest
+import tempfile
+import os
+import numpy as np
+import grl
+
+class TraceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'trace.bin')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_trace(self):
+        hm = grl.HistoryManager(maxlen=2)
+        writer = grl.TraceWriter(self.path, chunk=4, buffer=3)
+        hm.register(writer)
+        steps = [['up', '@'], ['up', '#'], ['stay', '#'], ['down', '@'], ['up', '@']]
+        for step in steps:
+            hm.record(step)
+        hm.extend(['stay', '#'])
+        hm.xdrop()
+        writer.close()
+        trace = grl.TraceReader(self.path)
+        self.assertEqual(len(trace), 10)
+        self.assertIsInstance(trace.records, np.memmap)
+        self.assertEqual(trace.t.tolist(), [0, 0, 1, 1, 2, 2, 3, 3, 4, 4])
+        self.assertEqual(trace.order.tolist(), [1, 2] * 5)
+        self.assertEqual(trace.decode(trace.symbol), [x for step in steps for x in step])
+        self.assertEqual(sum(len(chunk) for chunk in trace.chunks(3)), 10)
+
+    def test_rewind(self):
+        hm = grl.HistoryManager()
+        with grl.TraceWriter(self.path, chunk=2, buffer=1) as writer:
+            hm.register(writer)
+            hm.record(['up', '@'])
+            hm.record(['up', '#'])
+            hm.drop()
+            hm.record(['down', '@'])
+        trace = grl.TraceReader(self.path)
+        self.assertEqual(trace.decode(trace.symbol), ['up', '@', 'down', '@'])
+
+class ReplayTestCase(TraceTestCase):
+
+    class Learner:
+        def __init__(self):
+            self.hm = grl.HistoryManager()
+            self.transitions = list()
+        def learn(self, h, a, e):
+            self.transitions.append((h.t, h[-1] if len(h) else None, a, e))
+
+    def write(self, steps, first=list()):
+        hm = grl.HistoryManager()
+        with grl.TraceWriter(self.path) as writer:
+            hm.register(writer)
+            if first:
+                hm.record(first)
+            for step in steps:
+                hm.record(step)
+
+    def test_replay(self):
+        steps = [['up', '@'], ['up', '#'], [(0, 1), '@']]
+        self.write(steps)
+        learner = self.Learner()
+        self.assertEqual(grl.replay(learner, self.path, passes=2, chunk=3), 6)
+        self.assertEqual(learner.transitions[:3], [(0.0, None, 'up', '@'), (1.0, '@', 'up', '#'), (2.0, '#', (0, 1), '@')])
+        self.assertEqual(learner.transitions[3:], learner.transitions[:3])
+        self.assertEqual(list(learner.hm.h), ['up', '@', 'up', '#', (0, 1), '@'])
+
+    def test_domain_initiated(self):
+        self.write([['up', '#'], ['down', '@']], first=['@'])
+        learner = self.Learner()
+        grl.replay(learner, self.path, order=2)
+        self.assertEqual(learner.transitions, [(0.5, '@', 'up', '#'), (1.5, '#', 'down', '@')])
+
+    def test_shuffle(self):
+        steps = [['up', '@'], ['up', '#'], ['down', '@'], ['stay', '#']]
+        self.write(steps)
+        learner = self.Learner()
+        self.assertEqual(grl.replay(learner, self.path, shuffle=True, seed=0, passes=3), 12)
+        self.assertEqual(sorted(learner.transitions[:4], key=lambda x: x[0]), 
+                         [(0.0, None, 'up', '@'), (1.0, '@', 'up', '#'), (2.0, '#', 'down', '@'), (3.0, '@', 'stay', '#')])
@@ -0,0 +1,212 @@
+import os
+import pickle
+import numpy as np
+import grl
+
+__all__ = ['TraceWriter', 'TraceReader', 'replay']
+
+MAGIC = b'GRLTRACE'
+# magic, version, record size, number of records
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('itemsize', '<u4'), ('count', '<u8'), ('reserved', '<u8')])
+# step of the item, order of the item within the step, (interned) symbol
+RECORD = np.dtype([('t', '<i8'), ('order', '<i2'), ('symbol', '<i4')])
+
+def symbols_path(path):
+    return path + '.symbols'
+
+class TraceWriter:
+    """
+    Appends the items recorded in a history to a memory-mapped trace file.
+    Register it on the ADD and REMOVE events of a HistoryManager. The extensions are not traced.
+
+    path -- trace file
+    symbols -- Interner of the symbols (default: a new Interner)
+    chunk -- number of records by which the file grows (default 2**20)
+    buffer -- number of records kept in memory between the flushes (default 2**14)
+
+    """
+    def __init__(self, path, symbols=None, **kwargs):
+        self.path = path
+        self.symbols = symbols if isinstance(symbols, grl.Interner) else grl.Interner()
+        self.chunk = kwargs.get('chunk', 2**20)
+        self.buffer = kwargs.get('buffer', 2**14)
+        self.indices = list() # (absolute) indices of the pending items
+        self.ids = list() # ids of the pending items
+        self.steplen = 1
+        self.count = 0 # flushed records
+        self.capacity = 0
+        self.records = None
+        self.file = open(path, 'w+b')
+        self.file.write(self.header().tobytes())
+        self.file.flush()
+
+    def header(self):
+        return np.array([(MAGIC, 1, RECORD.itemsize, self.count, 0)], dtype=HEADER)
+
+    def on(self, event):
+        if event.data.get('extension', False):
+            return
+        h, update = event.data['h'], event.data['update']
+        if event.type == grl.EventType.REMOVE:
+            # the removed records are overwritten later
+            self.rewind(len(update))
+            return
+        start = int(round(h.t * h.steplen))
+        self.steplen = h.steplen
+        self.indices.extend(range(start, start + len(update)))
+        self.ids.extend(map(self.symbols.intern, update))
+        if len(self.ids) >= self.buffer:
+            self.flush()
+
+    def rewind(self, n):
+        k = min(n, len(self.ids))
+        del self.indices[len(self.indices) - k:]
+        del self.ids[len(self.ids) - k:]
+        self.count = max(self.count - (n - k), 0)
+
+    def reserve(self, n):
+        if self.count + n <= self.capacity:
+            return
+        self.capacity += self.chunk * -(-(self.count + n - self.capacity) // self.chunk)
+        self.records = None
+        self.file.truncate(HEADER.itemsize + self.capacity * RECORD.itemsize)
+        self.records = np.memmap(self.file, dtype=RECORD, mode='r+', offset=HEADER.itemsize, shape=(self.capacity,))
+
+    def flush(self):
+        if self.ids:
+            indices = np.array(self.indices, dtype=np.int64)
+            records = np.empty(len(indices), dtype=RECORD)
+            records['t'], records['order'] = np.divmod(indices, self.steplen)
+            records['order'] += 1
+            records['symbol'] = self.ids
+            self.indices, self.ids = list(), list()
+            self.reserve(len(records))
+            self.records[self.count:self.count + len(records)] = records
+            self.count += len(records)
+            self.records.flush()
+        self.file.seek(0)
+        self.file.write(self.header().tobytes())
+        self.file.flush()
+        with open(symbols_path(self.path), 'wb') as f:
+            pickle.dump(self.symbols.symbols, f)
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.records = None
+        self.file.truncate(HEADER.itemsize + self.count * RECORD.itemsize)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class TraceReader:
+    """
+    A trace file as (memory-mapped) NumPy arrays: nothing is loaded until it is accessed.
+
+    path -- trace file
+
+    """
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER, count=1)[0]
+        if header['magic'] != MAGIC or header['itemsize'] != RECORD.itemsize:
+            raise ValueError("{} is not a valid trace file.".format(path))
+        self.count = int(header['count'])
+        self.records = np.memmap(path, dtype=RECORD, mode='r', offset=HEADER.itemsize, shape=(self.count,)) \
+                       if self.count else np.empty(0, dtype=RECORD)
+        self.symbols = grl.Interner()
+        if os.path.exists(symbols_path(path)):
+            with open(symbols_path(path), 'rb') as f:
+                self.symbols.encode(pickle.load(f))
+
+    @property
+    def t(self):
+        return self.records['t']
+
+    @property
+    def order(self):
+        return self.records['order']
+
+    @property
+    def symbol(self):
+        return self.records['symbol']
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def chunks(self, size=2**16):
+        for i in range(0, self.count, size):
+            yield self.records[i:i + size]
+
+    def decode(self, ids):
+        return self.symbols.decode(ids)
+
+def replay(agent, trace, **kwargs):
+    """
+    Replays a trace to an agent: the agent learns from the recorded (a, e) pairs without Domain.react.
+    The rewards are given by the reward function of the agent (i.e. a function of the history).
+
+    trace -- TraceReader or path of a trace file
+    hm -- HistoryManager of the rebuilt history (default: the agent's)
+    passes -- number of passes over the trace (default 1)
+    shuffle -- learn the transitions in a random order, each on a history of its last context steps (default False)
+    context -- number of steps before a shuffled transition (default 1)
+    chunk -- number of records decoded at once (default 2**16)
+    order -- order of the actions in the steps (default 1)
+    seed -- seed of the shuffling (default None)
+    Returns the number of learned transitions.
+
+    """
+    if not isinstance(trace, TraceReader):
+        trace = TraceReader(trace)
+    hm = kwargs.get('hm', agent.hm)
+    passes = kwargs.get('passes', 1)
+    chunk = kwargs.get('chunk', 2**16)
+    action_order = kwargs.get('order', 1)
+    # the symbols indexed by their ids
+    symbols = np.empty(len(trace.symbols), dtype=object)
+    for i, symbol in enumerate(trace.symbols):
+        symbols[i] = symbol
+
+    n = 0
+    if kwargs.get('shuffle', False):
+        rng = np.random.default_rng(kwargs.get('seed', None))
+        context = int(kwargs.get('context', 1) * hm.steplen)
+        # the actions followed by a percept
+        actions = np.flatnonzero(trace.order[:-1] == action_order) if len(trace) else np.empty(0, dtype=int)
+        for _ in range(passes):
+            for i in rng.permutation(actions).tolist():
+                start = max(i - context, 0)
+                h = grl.History(history=symbols[trace.symbol[start:i]].tolist(), steplen=hm.steplen)
+                record = trace[i]
+                h.steps = (int(record['t']) * hm.steplen + int(record['order']) - 1) / hm.steplen
+                a, e = symbols[trace.symbol[i:i + 2]].tolist()
+                agent.learn(h, a, e)
+                n += 1
+        return n
+
+    for _ in range(passes):
+        hm.clear()
+        a = None
+        for records in trace.chunks(chunk):
+            for item, order in zip(symbols[records['symbol']].tolist(), records['order'].tolist()):
+                if a is None:
+                    if order == action_order:
+                        a = item
+                    else:
+                        # the items before the first action
+                        hm.record([item])
+                else:
+                    agent.learn(hm.h, a, item)
+                    hm.record([a, item])
+                    a = None
+                    n += 1
+    return n
@@ -4,8 +4,9 @@ import grl
 import random
 
 
-def sample(p_row):
-    return np.random.choice(len(p_row), p=p_row)
+# rng -- random number generator, e.g. the np_random of an object (default: np.random)
+def sample(p_row, rng=np.random):
+    return rng.choice(len(p_row), p=p_row)
 
 def random_probability_matrix(dim1=2, dim2=4, repeat_second_dimension=True):
     '''
@@ -20,12 +21,13 @@ def random_probability_matrix(dim1=2, dim2=4, repeat_second_dimension=True):
     T = T / T.sum(axis=-1, keepdims=True)
     return T
 
-def epsilon_sample(vect, argmax=None, epsilon=1.0):
-    p = random.uniform(0,1)
+# rng -- random number generator, e.g. the random of an object (default: random)
+def epsilon_sample(vect, argmax=None, epsilon=1.0, rng=random):
+    p = rng.uniform(0,1)
     if p > epsilon:
         return argmax
     else:
-        return random.sample(vect, 1)[0]  
+        return rng.sample(vect, 1)[0]  
 
 def optimal_policy(Q):
     if not isinstance(Q, grl.learning.Storage) or Q.dimensions != 2:
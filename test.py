@@ -2,8 +2,6 @@ import grl
 import numpy as np
 import collections
 from examples import *
-import time
-import datetime
 
 def phi_extreme_a(h, *args, **kwargs):
     q_func = kwargs.get('q_func', None)
@@ -52,34 +50,15 @@ agent = FrequencyAgent(history_mgr, exploration_factor=0.1, discount_factor=0.99
 # domain = grl.BinaryMock(history_mgr)
 # domain.hook(o_domain)
 
-agent.interact(domain)
-
-history_mgr.register(domain, grl.EventType.ADD)
-history_mgr.register(domain, grl.EventType.REMOVE)
-
 # A Domain-Initiated Framework
-# e = domain.start()
-# history_mgr.record([e])
+# simulator = grl.Simulator(agent, domain, history_mgr, order=2)
 
 # An Agent-Initiated Framework
-a = agent.start()
-e = domain.start(a)
-history_mgr.record([a,e])
+simulator = grl.Simulator(agent, domain, history_mgr, order=1)
 
-h = history_mgr.h
 T = 1000
-running_time = 0.0
-t0 = time.time()
-for t in range(T + 1):
-    a = agent.act(h)
-    e = domain.react(h, a)
-    agent.learn(h, a, e)
-    history_mgr.record([a,e])
-    if t/T*100000 % 1 == 0.0:
-        t1 = time.time()
-        running_time += t1-t0
-        print("\r{:.2f}% Complete - Elapsed: {}, Remaining: {}".format(t/T*100, datetime.timedelta(seconds=running_time), datetime.timedelta(seconds=running_time*(T-t)/(t+1))), end='')
-        t0 = time.time()
+simulator.add(T // 100, grl.Simulator.progress)
+simulator.run(T + 1)
 print('\n')
 
 print(agent.v)